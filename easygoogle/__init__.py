@@ -29,7 +29,7 @@ __ALL__ = [
 logger = logging.getLogger(__name__)
 
 if not os.environ.get("EASYGOOGLE_NO_AUTO_PATCH_RESOURCES"):
-    apply_patch()
+    apply_patch(lazy=bool(os.environ.get("EASYGOOGLE_LAZY_RESOURCES")))
 
 
 def set_default_cache(cache):
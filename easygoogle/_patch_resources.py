@@ -21,60 +21,136 @@ import googleapiclient.discovery
 import six
 
 
-def apply_patch_resources():
-    original = googleapiclient.discovery.Resource._add_nested_resources
-    if getattr(original, '__patched', False):
-        return
+def _create_nested_resource(parent, resourceDesc, rootDesc, schema):
+    kwargs = {}
+    if hasattr(parent, '_universe_domain'):
+        kwargs['universe_domain'] = parent._universe_domain
+
+    methodResource = googleapiclient.discovery.Resource(
+        http=parent._http, baseUrl=parent._baseUrl,
+        model=parent._model, developerKey=parent._developerKey,
+        requestBuilder=parent._requestBuilder,
+        resourceDesc=resourceDesc, rootDesc=rootDesc,
+        schema=schema, **kwargs
+    )
+
+    # setattr(methodResource, '__doc__', 'A collection resource.')
+    setattr(methodResource, '__is_resource__', True)
+
+    return methodResource
+
+
+def lazy_resources() -> bool:
+    """Whether nested resources are built on first access, as set by apply_patch_resources."""
+    return getattr(googleapiclient.discovery.Resource._add_nested_resources, '__lazy', False)
+
+
+def rebind_resource(template, http, request_builder=None):
+    """Shallow view of a built resource tree making its requests through another http.
+
+    Discovery descriptions, schemas and method functions are shared with the template,
+    only the bound methods are recreated. Nested resources are rebound on first access
+    in lazy mode, and right away otherwise.
+    """
+    view = googleapiclient.discovery.Resource.__new__(googleapiclient.discovery.Resource)
+    state = view.__dict__
+    state.update(template.__dict__)
+    state['_http'] = http
+    if request_builder is not None:
+        state['_requestBuilder'] = request_builder
+    state['_dynamic_attrs'] = []
+    # __getattr__ is installed in both modes, it also serves views of lazily built templates
+    lazy = lazy_resources()
+
+    for name in template._dynamic_attrs:
+        value = template.__dict__[name]
+        if isinstance(value, googleapiclient.discovery.Resource):
+            if lazy:
+                del state[name]
+                continue
+            value = rebind_resource(value, http, request_builder)
+        elif getattr(value, '__self__', None) is template:
+            value = value.__func__.__get__(view, type(view))
+        state[name] = value
+        state['_dynamic_attrs'].append(name)
+
+    # Lazily built nested resources are taken from the template tree
+    state.pop('_nested_resources', None)
+    state['_shared_template'] = template
+    return view
+
+
+def apply_patch_resources(lazy=False):
+    current = googleapiclient.discovery.Resource._add_nested_resources
+    if getattr(current, '__patched', False):
+        if getattr(current, '__lazy', False) == lazy:
+            return
+        original = current.__wrapped__
+    else:
+        original = current
 
     # noinspection PyPep8Naming
     @functools.wraps(original)
     def _add_nested_resources(self, resourceDesc, rootDesc, schema):
         # Add in nested resources
         if 'resources' in resourceDesc:
-
-            def createResourceMethod(methodName, methodDesc):
-                """Create a method on the Resource to access a nested Resource.
-
-                Args:
-                methodName: string, name of the method to use.
-                methodDesc: object, fragment of deserialized discovery document that
-                describes the method.
-                """
-                methodName = googleapiclient.discovery.fix_method_name(
-                    methodName)
-
-                methodResource = googleapiclient.discovery.Resource(
-                    http=self._http, baseUrl=self._baseUrl,
-                    model=self._model, developerKey=self._developerKey,
-                    requestBuilder=self._requestBuilder,
-                    resourceDesc=methodDesc, rootDesc=rootDesc,
-                    schema=schema,
-                )
-
-                # setattr(methodResource, '__doc__', 'A collection resource.')
-                setattr(methodResource, '__is_resource__', True)
-
-                return (methodName, methodResource)
-
             for methodName, methodDesc in six.iteritems(resourceDesc['resources']):
-                fixedMethodName, method = createResourceMethod(
-                    methodName, methodDesc)
+                fixedMethodName = googleapiclient.discovery.fix_method_name(
+                    methodName)
+                method = _create_nested_resource(
+                    self, methodDesc, rootDesc, schema)
                 self._set_dynamic_attr(fixedMethodName, method)
 
-    _add_nested_resources.__patched = True
+    # noinspection PyPep8Naming
+    @functools.wraps(original)
+    def _add_lazy_nested_resources(self, resourceDesc, rootDesc, schema):
+        # Only register the nested resources, they are built on first access
+        self.__dict__['_nested_resources'] = {
+            googleapiclient.discovery.fix_method_name(methodName): methodDesc
+            for methodName, methodDesc in six.iteritems(resourceDesc.get('resources', {}))
+        }
+
+    def getattr_(self, name):
+        template = self.__dict__.get('_shared_template')
+        nested = self.__dict__.get('_nested_resources')
+        if template is not None:
+            resource = getattr(template, name)
+            if not isinstance(resource, googleapiclient.discovery.Resource):
+                return resource
+            created = rebind_resource(resource, self._http, self._requestBuilder)
+        elif nested is not None and name in nested:
+            created = _create_nested_resource(
+                self, nested[name], self._rootDesc, self._schema)
+        else:
+            raise AttributeError(
+                "'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
+        # Concurrent first accesses may build twice, but all of them get the same instance
+        resource = self.__dict__.setdefault(name, created)
+        if resource is created:
+            self._dynamic_attrs.append(name)
+        return resource
+
+    patched = _add_lazy_nested_resources if lazy else _add_nested_resources
+    patched.__patched = True
+    patched.__lazy = lazy
 
     def call(self):
         return self
 
     setattr(
         googleapiclient.discovery.Resource,
-        '_add_nested_resources', _add_nested_resources
+        '_add_nested_resources', patched
     )
     setattr(
         googleapiclient.discovery.Resource,
         '__call__', call
     )
+    setattr(
+        googleapiclient.discovery.Resource,
+        '__getattr__', getattr_
+    )
 
 
-def apply_patch():
-    apply_patch_resources()
+def apply_patch(lazy=False):
+    apply_patch_resources(lazy=lazy)
@@ -0,0 +1,178 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Callable, List, Tuple
+
+from googleapiclient.errors import HttpError
+
+from .utils import error_reasons
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_NUM_RETRIES = 3
+
+RETRYABLE_STATUS = frozenset((429, 500, 502, 503, 504))
+RETRYABLE_REASONS = frozenset(('rateLimitExceeded', 'userRateLimitExceeded', 'backendError'))
+
+
+def is_retryable(exception) -> bool:
+    if not isinstance(exception, HttpError):
+        return False
+    if exception.resp.status in RETRYABLE_STATUS:
+        return True
+    return bool(error_reasons(exception) & RETRYABLE_REASONS)
+
+
+class BatchEngine(object):
+    """Groups submitted requests into batch calls.
+
+    A batch is sent as soon as max_batch_size requests are pending, or flush_interval
+    seconds after the first pending request. Sub-requests failing with a retryable
+    error are executed again individually.
+    """
+
+    def __init__(self,
+                 batch_factory: Callable,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 num_retries: int = DEFAULT_NUM_RETRIES):
+        self._batch_factory = batch_factory
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.num_retries = num_retries
+
+        self._condition = threading.Condition()
+        self._pending: List[Tuple[object, Future]] = []
+        self._inflight: List[Future] = []
+        self._flush_requested = False
+        self._closed = False
+        self._worker = None
+
+    def submit(self, request) -> Future:
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot submit requests to a closed batch engine")
+            self._pending.append((request, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='easygoogle-batch', daemon=True)
+                self._worker.start()
+            self._condition.notify()
+        return future
+
+    def flush(self):
+        """Send every pending request and wait for their results."""
+        with self._condition:
+            futures = [future for _, future in self._pending] + self._inflight
+            self._flush_requested = True
+            self._condition.notify()
+        wait(futures)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _next_chunk(self):
+        deadline = None
+        with self._condition:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    deadline = None
+                    self._flush_requested = False
+                    self._condition.wait()
+                    continue
+
+                if len(self._pending) >= self.max_batch_size or self._flush_requested or self._closed:
+                    break
+
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            chunk = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            self._inflight = [future for _, future in chunk]
+            return chunk
+
+    def _run(self):
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return
+            try:
+                self._execute(chunk)
+            except Exception as e:
+                # Failed before reaching the requests, like creating the batch
+                logger.warning("Batch of %d requests failed: %s", len(chunk), e)
+                for _, future in chunk:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._inflight = []
+
+    def _execute(self, chunk):
+        retry = []
+
+        def callback(request_id, response, exception):
+            request, future = chunk[int(request_id)]
+            if exception is None:
+                future.set_result(response)
+            elif is_retryable(exception):
+                retry.append((request, future))
+            else:
+                future.set_exception(exception)
+
+        batch = self._batch_factory()
+        running = []
+        for idx, (request, future) in enumerate(chunk):
+            if future.set_running_or_notify_cancel():
+                batch.add(request, callback=callback, request_id=str(idx))
+                running.append((request, future))
+
+        if not running:
+            return
+
+        try:
+            batch.execute()
+        except Exception as e:
+            logger.warning("Batch of %d requests failed, executing them individually: %s", len(running), e)
+            retry = [(request, future) for request, future in running if not future.done()]
+
+        for request, future in retry:
+            try:
+                future.set_result(request.execute(num_retries=self.num_retries))
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,122 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import hashlib
+import logging
+import os
+import time
+from typing import Optional
+
+from googleapiclient.discovery_cache.base import Cache
+
+from ..constants import CONSTS
+from ..utils import atomic_write, mmap_read
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache(Cache):
+    """Discovery documents cache shared by every process on the host.
+
+    Documents are stored once per content hash under ``blobs/`` and each URL
+    points to its document through a small file under ``index/``. Every write
+    is an atomic rename, so concurrent readers never see a partial document.
+    """
+
+    def __init__(self,
+                 directory: Optional[str] = None,
+                 ttl: Optional[float] = 24 * 60 * 60,
+                 max_size: Optional[int] = 64 * 1024 * 1024):
+        if directory is None:
+            directory = os.path.join(CONSTS.DEFAULT_APP_DIR, 'easygoogle', 'discovery')
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self._index_dir = os.path.join(directory, 'index')
+        self._blobs_dir = os.path.join(directory, 'blobs')
+        os.makedirs(self._index_dir, exist_ok=True)
+        os.makedirs(self._blobs_dir, exist_ok=True)
+
+    def get(self, url):
+        index_path = self._index_path(url)
+        try:
+            if self.ttl is not None and time.time() - os.stat(index_path).st_mtime > self.ttl:
+                return None
+            with open(index_path, 'r') as fl:
+                blob_path = os.path.join(self._blobs_dir, fl.read().strip())
+            content = mmap_read(blob_path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        try:
+            # Refresh the blob mtime so size eviction drops the least recently used first
+            os.utime(blob_path)
+        except OSError:
+            pass
+        return content.decode('utf-8')
+
+    def set(self, url, content):
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+
+        blob_path = os.path.join(self._blobs_dir, digest)
+        try:
+            # Already stored, unless another process evicts it meanwhile
+            os.utime(blob_path)
+        except OSError:
+            atomic_write(blob_path, data)
+        atomic_write(self._index_path(url), digest.encode('ascii'))
+
+        if self.max_size is not None:
+            self._evict(keep=digest)
+
+    def clear(self):
+        for directory in (self._index_dir, self._blobs_dir):
+            for entry in os.scandir(directory):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def _index_path(self, url) -> str:
+        return os.path.join(self._index_dir, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def _evict(self, keep: str):
+        blobs = []
+        total = 0
+        for entry in os.scandir(self._blobs_dir):
+            if entry.name.startswith('.'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+
+        if total <= self.max_size:
+            return
+
+        # Index entries pointing to an evicted blob are treated as misses on the next get
+        for _, size, entry in sorted(blobs, key=lambda item: item[0]):
+            if total <= self.max_size:
+                break
+            if entry.name == keep:
+                continue
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            logger.debug("Evicted discovery document %s", entry.name)
+            total -= size
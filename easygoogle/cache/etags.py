@@ -0,0 +1,89 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import time
+from typing import Hashable, NamedTuple, Optional
+
+from cachetools import LRUCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class StoredResponse(NamedTuple):
+    expires: float
+    etag: str
+    response: dict
+    content: bytes
+
+
+class ETagStoreStats(NamedTuple):
+    revalidated: int
+    changed: int
+    stored: int
+    currsize: int
+
+
+class ETagStore(object):
+    """Last response of read requests, revalidated with If-None-Match instead of downloaded again.
+
+    The least recently used responses are evicted to keep at most max_bytes of bodies,
+    responses older than ttl are downloaded again without condition.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._responses = LRUCache(max_bytes, getsizeof=lambda stored: len(stored.content))
+        self._revalidated = 0
+        self._changed = 0
+        self._stored = 0
+
+    def stats(self) -> ETagStoreStats:
+        with self._lock:
+            return ETagStoreStats(self._revalidated, self._changed, self._stored, self._responses.currsize)
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+    def get(self, key: Hashable) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._responses.get(key)
+            if stored is not None and stored.expires <= time.monotonic():
+                del self._responses[key]
+                return None
+            return stored
+
+    def put(self, key: Hashable, etag: str, response: dict, content: bytes):
+        stored = StoredResponse(time.monotonic() + self.ttl, etag, response, content or b'')
+        with self._lock:
+            if key in self._responses:
+                self._changed += 1
+            try:
+                self._responses[key] = stored
+            except ValueError:
+                # Larger than the whole store
+                self._responses.pop(key, None)
+                return
+            self._stored += 1
+
+    def revalidated(self, key: Hashable):
+        with self._lock:
+            self._revalidated += 1
+            stored = self._responses.get(key)
+            if stored is not None:
+                # The server confirmed the body, it is good for another ttl
+                self._responses[key] = stored._replace(expires=time.monotonic() + self.ttl)
@@ -0,0 +1,97 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+
+from cachetools import LRUCache
+
+from ..utils import method_setting
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 60
+
+
+class ResponseCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    coalesced: int
+    currsize: int
+
+
+class ResponseCache(object):
+    """Results of read requests, shared by identical concurrent calls and kept for a while.
+
+    ttls overrides the lifetime of the results of an API ("drive") or a method ("drive.files.get"),
+    0 only coalesces concurrent calls. Cached results are shared, treat them as read-only.
+    """
+
+    def __init__(self,
+                 maxsize: int = DEFAULT_MAXSIZE,
+                 ttl: float = DEFAULT_TTL,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self._lock = threading.Lock()
+        self._results = LRUCache(maxsize)
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def stats(self) -> ResponseCacheStats:
+        with self._lock:
+            return ResponseCacheStats(self._hits, self._misses, self._coalesced, len(self._results))
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def get_or_fetch(self, key: Hashable, method_id: str, fetch: Callable):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._hits += 1
+                return entry[1]
+
+            flight = self._in_flight.get(key)
+            if flight is None:
+                self._misses += 1
+                flight = self._in_flight[key] = Future()
+                leader = True
+            else:
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            return flight.result()
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            # Errors are shared with the waiting callers but not cached
+            with self._lock:
+                del self._in_flight[key]
+            flight.set_exception(e)
+            raise
+
+        ttl = method_setting(self.ttls, method_id, self.ttl)
+        with self._lock:
+            del self._in_flight[key]
+            if ttl > 0:
+                self._results[key] = (time.monotonic() + ttl, result)
+        flight.set_result(result)
+        return result
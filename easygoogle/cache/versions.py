@@ -0,0 +1,156 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from ..constants import CONSTS
+from ..errors import UncertainPreferredVersion, UnknownPreferredVersion
+from ..utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class PreferredVersionIndex(object):
+    """Preferred version of every API, fetched in a single discovery call and persisted on disk.
+
+    A stale index keeps answering while it is refreshed on a background thread.
+    APIs missing from the index refresh it, at most once every miss_interval seconds.
+    """
+
+    def __init__(self,
+                 fetch: Callable[[], Iterable[dict]],
+                 path: Optional[str] = None,
+                 ttl: float = 7 * 24 * 60 * 60,
+                 miss_interval: float = 10 * 60):
+        if path is None:
+            path = os.path.join(CONSTS.DEFAULT_APP_DIR, 'easygoogle', 'preferred_versions.json')
+        self.path = path
+        self.ttl = ttl
+        self.miss_interval = miss_interval
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        # Held while fetching, so concurrent callers share one fetch
+        self._fetch_lock = threading.Lock()
+        self._versions: Optional[Dict[str, Union[str, List[str]]]] = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._retry_at = 0.0
+
+    def get(self, api: str) -> str:
+        version = self.lookup(api, fetch=True)
+        if version is None:
+            raise UnknownPreferredVersion(api)
+        return version
+
+    def lookup(self, api: str, fetch: bool = False) -> Optional[str]:
+        """Preferred version of api, None when it is not in the index available without fetching."""
+        versions = self._load(fetch)
+        if versions is None:
+            return None
+
+        version = versions.get(api)
+        if version is None:
+            if not fetch:
+                return None
+            # The API may be newer than the index
+            version = self._refresh_on_miss(api)
+        if version is None:
+            raise UnknownPreferredVersion(api)
+        if isinstance(version, list):
+            raise UncertainPreferredVersion(api)
+        return version
+
+    def refresh(self):
+        items = self._fetch()
+
+        versions: Dict[str, Union[str, List[str]]] = {}
+        for item in items:
+            current = versions.get(item['name'])
+            if current is None:
+                versions[item['name']] = item['version']
+            elif isinstance(current, list):
+                current.append(item['version'])
+            else:
+                versions[item['name']] = [current, item['version']]
+
+        fetched_at = time.time()
+        with self._lock:
+            self._versions, self._fetched_at = versions, fetched_at
+
+        try:
+            atomic_write(self.path, json.dumps(
+                {'fetched': fetched_at, 'versions': versions},
+                separators=(',', ':'),
+            ).encode('utf-8'))
+        except OSError as e:
+            logger.warning("Could not persist preferred versions index: %s", e)
+
+    def _load(self, fetch: bool):
+        if self._versions is None:
+            with self._lock:
+                if self._versions is None:
+                    self._read()
+
+        if self._versions is None:
+            if not fetch:
+                return None
+            with self._fetch_lock:
+                if self._versions is None:
+                    self.refresh()
+        elif time.time() - self._fetched_at > self.ttl and time.time() > self._retry_at:
+            self._refresh_in_background()
+        return self._versions
+
+    def _refresh_on_miss(self, api: str):
+        with self._fetch_lock:
+            if time.time() - self._fetched_at > self.miss_interval and time.time() > self._retry_at:
+                try:
+                    self.refresh()
+                except Exception:
+                    self._retry_at = time.time() + self.miss_interval
+                    raise
+        return self._versions.get(api)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as fl:
+                data = json.load(fl)
+            self._versions, self._fetched_at = data['versions'], data['fetched']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable preferred versions index: %s", e)
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with self._fetch_lock:
+                    self.refresh()
+            except Exception as e:
+                logger.warning("Could not refresh preferred versions index: %s", e)
+                self._retry_at = time.time() + 60
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='easygoogle-preferred-versions', daemon=True).start()
@@ -13,17 +13,38 @@
 #  limitations under the License.
 #
 # -*- coding: utf-8 -*-
+import argparse
+import json
 import logging
-from json import dump
-from os.path import dirname, join
+from os.path import dirname, isfile, join
 
 from googleapiclient.discovery import build
 
-from easygoogle.config.full_api_dict import get_all_apis, build_api_dict
+from easygoogle.config.full_api_dict import (
+    DEFAULT_PARALLELISM, build_api_dict, build_api_dict_from_states, build_scopes_map, get_all_apis,
+    update_api_states,
+)
+from easygoogle.config.scope_index import write_scope_index
+from ..transport import PooledHttp
+from ..utils import atomic_write
 
 logger = logging.getLogger(__name__)
 
 
+def _write_registry(directory, apis):
+    # Save result configuration to json save file
+    atomic_write(join(directory, 'apis.json'), json.dumps(apis).encode('utf-8'))
+
+    # Compact short name index used to resolve scopes offline
+    atomic_write(
+        join(directory, 'scopes.json'),
+        json.dumps(build_scopes_map(apis), separators=(',', ':')).encode('utf-8'),
+    )
+
+    # Binary registry loaded by the controllers through mmap
+    write_scope_index(apis, join(directory, 'apis.idx'))
+
+
 def legacy_config():
     discovery = build(
         'discovery',
@@ -34,14 +55,49 @@ def legacy_config():
 
     apis = build_api_dict(discovery, api_list)
 
-    # Save result configuration to json save file
-    with open(join(dirname(__file__), 'apis.json'), 'w') as fl:
-        dump(apis, fl)
+    _write_registry(dirname(__file__), apis)
+
+    return apis
+
+
+def incremental_config(parallelism=DEFAULT_PARALLELISM, directory=None):
+    """Update the registry, fetching only the discovery documents that changed since the last run."""
+    if directory is None:
+        directory = dirname(__file__)
+    state_path = join(directory, 'apis.state.json')
 
-        return apis
+    discovery = build(
+        'discovery',
+        'v1',
+        http=PooledHttp(),
+        cache_discovery=False,
+    )
+    api_list = get_all_apis(discovery, fields='items(name,title,version,preferred,discoveryRestUrl)')
+
+    states = {}
+    if isfile(state_path):
+        with open(state_path, 'r') as fl:
+            states = json.load(fl)
+
+    states, changes = update_api_states(api_list, states, parallelism)
+    apis = build_api_dict_from_states(states)
+
+    if changes or not isfile(join(directory, 'apis.json')):
+        _write_registry(directory, apis)
+    logger.info("%d of %d APIs changed", changes, len(api_list))
+
+    atomic_write(state_path, json.dumps(states, separators=(',', ':')).encode('utf-8'))
+    return apis
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Regenerate the easygoogle APIs registry")
+    parser.add_argument('--parallelism', type=int, default=DEFAULT_PARALLELISM,
+                        help="Discovery documents fetched concurrently")
+    parser.add_argument('--full', action='store_true',
+                        help="Rebuild the whole registry with the legacy batched generator")
+    args = parser.parse_args()
+
     # Instantiate basic logging
     logging.basicConfig(
         level=logging.INFO,
@@ -49,7 +105,10 @@ def main():
     )
 
     # Start configuration
-    legacy_config()
+    if args.full:
+        legacy_config()
+    else:
+        incremental_config(args.parallelism)
 
 
 if __name__ == "__main__":
@@ -15,14 +15,21 @@
 import json
 import logging
 import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from ..transport import PooledHttp
 
 logger = logging.getLogger(__name__)
 
+API_FIELDS = ('name', 'title', 'version', 'preferred')
+DEFAULT_PARALLELISM = 16
+
 
-def get_all_apis(discovery_api):
+def get_all_apis(discovery_api, fields='items(name,title,version,preferred)'):
     apis_res = discovery_api.apis()
     get_page = apis_res.list(
-        fields='items(name,title,version,preferred)',
+        fields=fields,
     )
 
     if not hasattr(apis_res, 'list_next'):
@@ -83,11 +90,107 @@ def build_api_dict(discovery, api_list):
                 ),
                 callback=parse_rest_definition(api_item)
             )
-            batch.execute()
+        batch.execute()
+
+    return apis
+
+
+def _auth_document_url(api):
+    parsed = urllib.parse.urlparse(api['discoveryRestUrl'])
+    query = urllib.parse.parse_qsl(parsed.query)
+    query.append(('fields', 'auth,revision,etag'))
+    return urllib.parse.urlunparse(parsed._replace(query=urllib.parse.urlencode(query)))
+
+
+def fetch_api_state(api, previous=None, http=None):
+    """Fetch the scopes of an API, unless its discovery document did not change since previous."""
+    if http is None:
+        http = PooledHttp()
+
+    headers = {}
+    if previous and previous.get('etag'):
+        headers['if-none-match'] = previous['etag']
+
+    response, content = http.request(_auth_document_url(api), 'GET', headers=headers)
+    if response.status == 304:
+        return previous, False
+    if response.status >= 300:
+        raise IOError("Discovery document of %s %s returned HTTP %d" % (
+            api['name'], api['version'], response.status))
+
+    document = json.loads(content.decode('utf-8'))
+    state = {
+        'api': {key: api[key] for key in API_FIELDS if key in api},
+        'etag': response.get('etag') or document.get('etag'),
+        'revision': document.get('revision'),
+        'scopes': {
+            scope.strip('/').split('/')[-1]: scope
+            for scope in document.get('auth', {}).get('oauth2', {}).get('scopes', {})
+        },
+    }
+    changed = (
+        previous is None
+        or previous.get('revision') != state['revision']
+        or previous.get('scopes') != state['scopes']
+        or previous.get('api') != state['api']
+    )
+    return state, changed
+
+
+def update_api_states(api_list, states, parallelism=DEFAULT_PARALLELISM):
+    """Refresh the stored state of every listed API concurrently.
+
+    Returns the new states and the number of APIs that changed.
+    """
+    http = PooledHttp()
+
+    def update(api):
+        key = '%s:%s' % (api['name'], api['version'])
+        previous = states.get(key)
+        try:
+            state, changed = fetch_api_state(api, previous, http)
+        except Exception as e:
+            logger.warning(
+                "Could not acquire openapi document for api '%s' version '%s': %s",
+                api['name'], api['version'], e
+            )
+            return key, previous, False
+        if changed:
+            logger.info("Configuring scopes for \"%s\"...", api.get('title', api['name']))
+        return key, state, changed
+
+    new_states = {}
+    changes = 0
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        for key, state, changed in executor.map(update, api_list):
+            if state is not None:
+                new_states[key] = state
+            changes += changed
+
+    # APIs removed from the directory are dropped along with their scopes
+    changes += len(set(states) - set(new_states))
+    return new_states, changes
 
+
+def build_api_dict_from_states(states):
+    apis = {}
+    for key in sorted(states):
+        state = states[key]
+        for name, scope in state['scopes'].items():
+            if name in apis:
+                apis[name]['apis'].append(state['api'])
+            else:
+                apis[name] = {'apis': [state['api']], 'scope': scope}
     return apis
 
 
+def build_scopes_map(apis):
+    return {
+        name: info['scope']
+        for name, info in apis.items()
+    }
+
+
 def load_api_dict():
     file_path = os.path.join(os.path.dirname(__file__), 'apis.json')
     if os.path.isfile(file_path):
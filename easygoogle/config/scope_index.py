@@ -0,0 +1,154 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Binary scope registry, queried through mmap without loading it whole.
+#
+# Layout, all integers little endian:
+#   header   magic, format version, scopes count, records count, strings offset
+#   scopes   fixed size entries sorted by short name: name, url, first record, records count
+#   records  fixed size entries: api tag, api name, version, preferred flag
+#   strings  every distinct string, stored once, referenced by offset and length
+
+import mmap
+import os
+import struct
+from typing import Dict, List, NamedTuple, Optional
+
+from ..utils import atomic_write
+
+MAGIC = b'EGSI'
+FORMAT_VERSION = 1
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'apis.idx')
+
+_HEADER = struct.Struct('<4sHxxIII')
+_SCOPE = struct.Struct('<IIIIII')
+_RECORD = struct.Struct('<IIIIIIB3x')
+
+
+class ApiRecord(NamedTuple):
+    tag: str
+    name: str
+    version: str
+    preferred: bool
+
+
+class ScopeEntry(NamedTuple):
+    scope: str
+    apis: List[ApiRecord]
+
+
+def api_tag(name: str, version: str) -> str:
+    # Process suffix when there are subidentifier in version
+    suffix = version.split('_v')
+    suffix = "_" + suffix[0] if len(suffix) > 1 else ""
+    return name + suffix
+
+
+def write_scope_index(apis: Dict[str, dict], path: str = DEFAULT_INDEX_PATH):
+    """Generate the binary index from a registry as loaded from apis.json."""
+    strings = bytearray()
+    interned: Dict[str, tuple] = {}
+
+    def intern(value: str):
+        if value not in interned:
+            data = value.encode('utf-8')
+            interned[value] = (len(strings), len(data))
+            strings.extend(data)
+        return interned[value]
+
+    scopes = bytearray()
+    records = bytearray()
+    record_count = 0
+    names = sorted(apis, key=lambda item: item.encode('utf-8'))
+    for name in names:
+        entry = apis[name]
+        scopes.extend(_SCOPE.pack(*intern(name), *intern(entry['scope']), record_count, len(entry['apis'])))
+        for api in entry['apis']:
+            records.extend(_RECORD.pack(
+                *intern(api_tag(api['name'], api['version'])),
+                *intern(api['name']),
+                *intern(api['version']),
+                bool(api.get('preferred')),
+            ))
+            record_count += 1
+
+    strings_offset = _HEADER.size + len(scopes) + len(records)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(names), record_count, strings_offset)
+    atomic_write(path, header + bytes(scopes) + bytes(records) + bytes(strings))
+
+
+class ScopeIndex(object):
+    """Read-only view of a binary scope index, pages are shared by every process mapping it."""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        with open(path, 'rb') as fl:
+            self._map = mmap.mmap(fl.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._scope_count, self._record_count, self._strings_offset = \
+            _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError("%s is not a supported scope index" % path)
+        self._records_offset = _HEADER.size + self._scope_count * _SCOPE.size
+
+    def __len__(self):
+        return self._scope_count
+
+    def __contains__(self, scope: str):
+        return self._find(scope.encode('utf-8')) is not None
+
+    def close(self):
+        self._map.close()
+
+    def lookup(self, scope: str) -> Optional[ScopeEntry]:
+        position = self._find(scope.encode('utf-8'))
+        if position is None:
+            return None
+
+        _, _, url_off, url_len, first, count = self._scope_at(position)
+        apis = []
+        for idx in range(first, first + count):
+            values = _RECORD.unpack_from(self._map, self._records_offset + idx * _RECORD.size)
+            apis.append(ApiRecord(
+                self._string(values[0], values[1]),
+                self._string(values[2], values[3]),
+                self._string(values[4], values[5]),
+                bool(values[6]),
+            ))
+        return ScopeEntry(self._string(url_off, url_len), apis)
+
+    def _scope_at(self, position):
+        return _SCOPE.unpack_from(self._map, _HEADER.size + position * _SCOPE.size)
+
+    def _raw_string(self, offset, length) -> bytes:
+        start = self._strings_offset + offset
+        return self._map[start:start + length]
+
+    def _string(self, offset, length) -> str:
+        return self._raw_string(offset, length).decode('utf-8')
+
+    def _find(self, name: bytes) -> Optional[int]:
+        # Binary search over the sorted scope entries
+        low, high = 0, self._scope_count
+        while low < high:
+            middle = (low + high) // 2
+            name_off, name_len = self._scope_at(middle)[:2]
+            current = self._raw_string(name_off, name_len)
+            if current < name:
+                low = middle + 1
+            elif current > name:
+                high = middle
+            else:
+                return middle
+        return None
@@ -12,27 +12,9 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import re
-
-import requests
-
-__scopes_short_map = None
+from easygoogle.config.scopes import SCOPES_INDEX
 
 
 def get_scopes_short_map():
-    global __scopes_short_map
-    if __scopes_short_map is None:
-        with requests.get("https://developers.google.com/identity/protocols/googlescopes") as res:
-            data = res.text
-        rgx = re.compile(r"<tr>\s*<td>(https://[\w./\-\d]+?) ?</td")
-
-        scopes = [
-            match.group(1)
-            for match in rgx.finditer(data)
-        ]
-
-        __scopes_short_map = {
-            scope.rsplit('/', 1)[-1]: scope
-            for scope in scopes
-        }
-    return __scopes_short_map
+    # Kept for compatibility, scopes are no longer scraped from the documentation pages
+    return SCOPES_INDEX.scopes
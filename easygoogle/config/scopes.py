@@ -0,0 +1,139 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from googleapiclient.discovery import build
+
+from easygoogle.config.full_api_dict import build_api_dict, build_scopes_map, get_all_apis, load_api_dict
+from ..constants import CONSTS
+from ..utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Written next to the package by the config generator, python -m easygoogle.config
+SHIPPED_INDEX = os.path.join(os.path.dirname(__file__), 'scopes.json')
+DEFAULT_SCOPE_PREFIX = 'https://www.googleapis.com/auth/'
+# OpenID Connect scopes are used as is
+OPENID_SCOPES = frozenset(('openid', 'email', 'profile'))
+
+
+class ScopesIndex(object):
+    """Map of scope short names to their URLs, built ahead of time from discovery documents.
+
+    The index shipped with the package is complemented by a refreshed copy on disk, when present.
+    With auto_refresh enabled, a copy older than ttl is rebuilt on a background thread.
+    """
+
+    def __init__(self,
+                 fetch: Optional[Callable[[], Dict[str, str]]] = None,
+                 path: Optional[str] = None,
+                 ttl: float = 30 * 24 * 60 * 60,
+                 auto_refresh: bool = False):
+        if path is None:
+            path = os.path.join(CONSTS.DEFAULT_APP_DIR, 'easygoogle', 'scopes.json')
+        self.path = path
+        self.ttl = ttl
+        self.auto_refresh = auto_refresh
+        self._fetch = fetch if fetch is not None else _fetch_scopes_map
+        self._lock = threading.Lock()
+        self._scopes: Optional[Dict[str, str]] = None
+        self._refreshed_at = 0.0
+        self._refreshing = False
+
+    @property
+    def scopes(self) -> Dict[str, str]:
+        if self._scopes is None:
+            with self._lock:
+                if self._scopes is None:
+                    self._scopes = self._load()
+
+        if self.auto_refresh and time.time() - self._refreshed_at > self.ttl:
+            self._refresh_in_background()
+        return self._scopes
+
+    def resolve(self, scope: str) -> str:
+        if '://' in scope or scope in OPENID_SCOPES:
+            return scope
+        return self.scopes.get(scope) or DEFAULT_SCOPE_PREFIX + scope
+
+    def refresh(self):
+        scopes = self._fetch()
+        atomic_write(self.path, json.dumps(scopes, separators=(',', ':')).encode('utf-8'))
+
+        with self._lock:
+            merged = dict(self._scopes or {})
+            merged.update(scopes)
+            self._scopes, self._refreshed_at = merged, time.time()
+
+    def _load(self) -> Dict[str, str]:
+        scopes = {}
+
+        # Scopes of the locally generated registry
+        for name, info in load_api_dict().items():
+            scopes[name] = info['scope']
+
+        scopes.update(_read_index(SHIPPED_INDEX) or {})
+
+        refreshed = _read_index(self.path)
+        if refreshed is not None:
+            scopes.update(refreshed)
+            self._refreshed_at = os.stat(self.path).st_mtime
+        return scopes
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Could not refresh scopes index: %s", e)
+                # Do not retry before the next ttl
+                self._refreshed_at = time.time()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='easygoogle-scopes', daemon=True).start()
+
+
+def _read_index(path) -> Optional[Dict[str, str]]:
+    try:
+        with open(path, 'r') as fl:
+            return json.load(fl)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable scopes index %s: %s", path, e)
+        return None
+
+
+def _fetch_scopes_map() -> Dict[str, str]:
+    discovery = build('discovery', 'v1', cache_discovery=False)
+    return build_scopes_map(build_api_dict(discovery, get_all_apis(discovery)))
+
+
+SCOPES_INDEX = ScopesIndex(auto_refresh=CONSTS.REFRESH_SCOPES)
+
+
+def resolve_scope(scope: str) -> str:
+    return SCOPES_INDEX.resolve(scope)
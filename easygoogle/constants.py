@@ -72,6 +72,24 @@ class _CONSTS(object):
             None
         )
 
+    @property
+    def DEFAULT_DELEGATION_POOL_SIZE(self) -> int:
+        return int(os.environ.get(
+            'EASYGOOGLE_DEFAULT_DELEGATION_POOL_SIZE',
+            4096
+        ))
+
+    @property
+    def DEFAULT_CLIENTS_CACHE_SIZE(self) -> int:
+        return int(os.environ.get(
+            'EASYGOOGLE_DEFAULT_CLIENTS_CACHE_SIZE',
+            32
+        ))
+
+    @property
+    def REFRESH_SCOPES(self) -> bool:
+        return bool(os.environ.get('EASYGOOGLE_REFRESH_SCOPES'))
+
     @property
     def ENFORCE_DEFAULT_OPT(self) -> str:
         return os.environ.get('EASYGOOGLE_ENFORCE_AUTH_MODE') == 'ENFORCE'
@@ -0,0 +1,278 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import json
+import logging
+import random
+import urllib.parse
+import weakref
+
+import aiohttp
+import httplib2
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import DISCOVERY_URI, V2_DISCOVERY_URI, build_from_document
+from googleapiclient.errors import HttpError, UnknownApiNameOrVersion
+from googleapiclient.http import HttpRequest, build_http
+
+from . import base
+from .oauth2 import oauth2
+from .service_account import ServiceAccount, _delegated
+from .._patch_resources import rebind_resource
+from ..errors import UncertainPreferredVersion, UnknownPreferredVersion
+from ..policy import RequestPolicy, apply_field_mask
+from ..transport import PooledHttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTIONS_LIMIT = 1000
+DISCOVERY_LIST_URI = 'https://www.googleapis.com/discovery/v1/apis'
+# Mirrors googleapiclient.http.MAX_URI_LENGTH
+MAX_URI_LENGTH = 2048
+
+_sessions = weakref.WeakKeyDictionary()
+_refresh_locks = weakref.WeakKeyDictionary()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Pooled session shared by every request executed on the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=DEFAULT_CONNECTIONS_LIMIT),
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_session():
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def refresh_credentials(credentials, force=False):
+    """Refresh credentials without blocking the event loop.
+
+    Concurrent callers share a single refresh per credentials object.
+    """
+    lock = _refresh_locks.get(credentials)
+    if lock is None:
+        lock = _refresh_locks.setdefault(credentials, asyncio.Lock())
+
+    stale_token = credentials.token
+    async with lock:
+        if credentials.token != stale_token or (credentials.valid and not force):
+            # Someone else refreshed while we were waiting
+            return
+        # google-auth has no stable async refresh, only the token round trip is moved out of the loop
+        await asyncio.get_running_loop().run_in_executor(None, credentials.refresh, Request())
+
+
+async def _fetch(method, uri, headers=None, body=None, credentials=None, num_retries=0):
+    session = get_session()
+    headers = dict(headers or {})
+
+    if credentials is not None and not credentials.valid:
+        await refresh_credentials(credentials)
+
+    refreshed = False
+    attempt = 0
+    while True:
+        if credentials is not None:
+            credentials.apply(headers)
+
+        async with session.request(method, uri, data=body, headers=headers) as res:
+            content = await res.read()
+            info = {key.lower(): value for key, value in res.headers.items()}
+            info['status'] = str(res.status)
+            reason = res.reason
+
+        if res.status == 401 and credentials is not None and not refreshed:
+            refreshed = True
+            await refresh_credentials(credentials, force=True)
+            continue
+
+        if (res.status >= 500 or res.status == 429) and attempt < num_retries:
+            attempt += 1
+            sleep_time = random.random() * 2 ** attempt
+            logger.warning("Sleeping %.2f seconds before retry %d of %d for %s %s, after %s",
+                           sleep_time, attempt, num_retries, method, uri, res.status)
+            await asyncio.sleep(sleep_time)
+            continue
+        break
+
+    # The body was already decoded by aiohttp
+    info.pop('content-encoding', None)
+    response = httplib2.Response(info)
+    response.reason = reason
+    return response, content
+
+
+class AsyncHttpRequest(HttpRequest):
+    """HttpRequest that can also be executed on an asyncio event loop."""
+
+    async def execute_async(self, num_retries=0):
+        if self.resumable:
+            # Uploaded in chunks by googleapiclient on a worker thread, with its own httplib2 transport
+            http = build_http()
+            credentials = getattr(self.http, 'credentials', None)
+            if credentials is not None:
+                http = AuthorizedHttp(credentials, http=http)
+            return await asyncio.get_running_loop().run_in_executor(None, self.execute, http, num_retries)
+
+        uri, method, body, headers = self.uri, self.method, self.body, dict(self.headers)
+        if len(uri) > MAX_URI_LENGTH and method == 'GET':
+            parsed = urllib.parse.urlparse(uri)
+            uri = urllib.parse.urlunparse(
+                (parsed.scheme, parsed.netloc, parsed.path, parsed.params, None, None))
+            method, body = 'POST', parsed.query
+            headers['x-http-method-override'] = 'GET'
+            headers['content-type'] = 'application/x-www-form-urlencoded'
+        headers.pop('content-length', None)
+
+        response, content = await _fetch(
+            method, uri,
+            headers=headers,
+            body=body,
+            credentials=getattr(self.http, 'credentials', None),
+            num_retries=num_retries,
+        )
+
+        for callback in self.response_callbacks:
+            callback(response)
+        if response.status >= 300:
+            raise HttpError(response, content, uri=self.uri)
+        return self.postproc(response, content)
+
+
+class AsyncRequestBuilder(object):
+    """requestBuilder creating AsyncHttpRequest with the field masks of a policy.
+
+    The other layers of the policy only apply to requests of synchronous clients.
+    """
+
+    def __init__(self, policy: RequestPolicy, api=None):
+        self.policy = policy
+        self.api = api
+
+    def __call__(self, *args, **kwargs) -> AsyncHttpRequest:
+        return apply_field_mask(AsyncHttpRequest(*args, **kwargs), self.policy, self.api)
+
+
+async def fetch_discovery_document(api, version, cache=None):
+    for template in (DISCOVERY_URI, V2_DISCOVERY_URI):
+        url = template.replace('{api}', api).replace('{apiVersion}', version)
+        if cache is not None:
+            content = cache.get(url)
+            if content:
+                return content
+
+        response, content = await _fetch('GET', url, num_retries=1)
+        if response.status == 404:
+            continue
+        if response.status >= 300:
+            raise HttpError(response, content, uri=url)
+
+        content = content.decode('utf-8')
+        if cache is not None:
+            cache.set(url, content)
+        return content
+
+    raise UnknownApiNameOrVersion("name: %s  version: %s" % (api, version))
+
+
+class _AsyncApiBuilder(base._ApiBuilder):
+    # Adds asyncio counterparts to the builder methods, built clients create AsyncHttpRequest
+
+    async def get_api_async(self, api, version=None, cache=None):
+        if cache is None:
+            cache = base.DEFAULT_CACHE
+
+        if version is None:
+            version = await self.get_preferred_version_async(api)
+
+        credentials = self._coordinated_credentials()
+        # The httplib2 transport of a client is not thread-safe, but a loop runs on one thread at a time
+        # and its coroutines share the client. Keying on the calling thread instead would build a client
+        # per executor worker and evict those of the loops.
+        key = (api, version, id(credentials), id(cache), AsyncHttpRequest, id(asyncio.get_running_loop()))
+        client = self._built_clients.get(key, credentials)
+        if client is None:
+            if self.share_discovery_tree and credentials is not None:
+                client = rebind_resource(
+                    await self._shared_tree_async(api, version, cache),
+                    AuthorizedHttp(credentials, http=build_http()),
+                    AsyncRequestBuilder(self._request_policy, api),
+                )
+            else:
+                document = await fetch_discovery_document(api, version, cache)
+                client = build_from_document(
+                    document,
+                    credentials=credentials,
+                    requestBuilder=AsyncRequestBuilder(self._request_policy, api),
+                )
+                logger.info("%s API Generated" % api)
+            self._built_clients.put(key, credentials, client)
+        return client
+
+    @staticmethod
+    async def _shared_tree_async(api, version, cache):
+        key = (api, version, id(cache), AsyncHttpRequest)
+        template = base.SHARED_TREES.get(key, cache)
+        if template is None:
+            document = await fetch_discovery_document(api, version, cache)
+            template = build_from_document(document, http=PooledHttp(), requestBuilder=AsyncHttpRequest)
+            logger.info("%s API Generated" % api)
+            base.SHARED_TREES.put(key, cache, template)
+        return template
+
+    @classmethod
+    async def get_preferred_version_async(cls, api):
+        if api not in cls._preferred_version_cache:
+            # Answer from the index when it is available without a blocking fetch
+            version = base.PREFERRED_VERSIONS.lookup(api)
+            if version is not None:
+                return version
+
+            uri = '%s?%s' % (DISCOVERY_LIST_URI, urllib.parse.urlencode({'name': api, 'preferred': 'true'}))
+            response, content = await _fetch('GET', uri, num_retries=1)
+            if response.status >= 300:
+                raise HttpError(response, content, uri=uri)
+
+            items = json.loads(content.decode('utf-8')).get('items', [])
+            if len(items) == 0:
+                raise UnknownPreferredVersion(api)
+            if len(items) > 1:
+                raise UncertainPreferredVersion(api)
+            cls._preferred_version_cache[api] = items[0]['version']
+        return cls._preferred_version_cache[api]
+
+
+# noinspection PyPep8Naming
+class async_oauth2(_AsyncApiBuilder, oauth2):
+    """Asyncio counterpart of oauth2."""
+
+
+class AsyncServiceAccount(_AsyncApiBuilder, ServiceAccount):
+    """Asyncio counterpart of ServiceAccount."""
+
+    def _delegated_builder(self, dCredentials):
+        return _async_delegated(dCredentials, getattr(self, 'valid_apis', None))
+
+
+class _async_delegated(_AsyncApiBuilder, _delegated):
+    pass
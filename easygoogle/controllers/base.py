@@ -16,19 +16,121 @@
 import abc
 import logging
 import os
+import threading
 import warnings
-from typing import Dict
+from typing import Dict, NamedTuple, Optional
 
-from cachetools import LFUCache
+from cachetools import LFUCache, LRUCache
 from google.auth.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient.http import HttpRequest, build_http
 
 from easygoogle.config.full_api_dict import load_api_dict
-from ..errors import UnknownPreferredVersion, UncertainPreferredVersion
+from easygoogle.config.scope_index import DEFAULT_INDEX_PATH, ScopeIndex, api_tag
+from .. import media, pagination
+from .._patch_resources import rebind_resource
+from ..batching import BatchEngine
+from ..cache.etags import ETagStore
+from ..cache.responses import ResponseCache
+from ..cache.versions import PreferredVersionIndex
+from ..constants import CONSTS
+from ..policy import DEFAULT_COMPRESS_MIN_SIZE, RequestBuilder, RequestPolicy, TransferStats
+from ..ratelimit import RateLimiter
+from ..retry import RetryPolicy
+from ..tokens.broker import BrokerClient, connect_broker, use_broker, user_credentials_spec
+from ..tokens.refresher import TokenRefresher
+from ..tokens.single_flight import DEFAULT_WAIT_TIMEOUT, single_flight
+from ..transport import PooledHttp, pooled_http
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_CACHE = LFUCache(20)
+
+class MemoryCache(Cache):
+    """In-process discovery documents cache."""
+
+    def __init__(self, maxsize: int):
+        self._lock = threading.Lock()
+        self._documents = LFUCache(maxsize)
+
+    def get(self, url):
+        with self._lock:
+            return self._documents.get(url)
+
+    def set(self, url, content):
+        with self._lock:
+            self._documents[url] = content
+
+
+DEFAULT_CACHE = MemoryCache(20)
+
+
+class ClientsCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class _BuiltClients(object):
+    # Bounded memo of built API clients, shared by every thread using the same builder.
+    # Keys of clients on thread-unsafe transports include the thread building them.
+
+    def __init__(self, maxsize: int):
+        self._lock = threading.Lock()
+        self._clients = LRUCache(maxsize) if maxsize > 0 else None
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, credentials):
+        if self._clients is None:
+            return None
+
+        with self._lock:
+            entry = self._clients.get(key)
+            # The key holds the credentials id, which may be reused once they are collected
+            if entry is not None and entry[0] is credentials:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, credentials, client):
+        if self._clients is None:
+            return
+        with self._lock:
+            self._clients[key] = (credentials, client)
+
+    def get_or_build(self, key, credentials, build_client):
+        client = self.get(key, credentials)
+        if client is None:
+            client = build_client()
+            self.put(key, credentials, client)
+        return client
+
+    def invalidate(self, api: Optional[str] = None, version: Optional[str] = None):
+        if self._clients is None:
+            return
+        with self._lock:
+            for key in list(self._clients.keys()):
+                if api is not None and key[0] != api:
+                    continue
+                if version is not None and key[1] != version:
+                    continue
+                del self._clients[key]
+
+    def info(self) -> ClientsCacheInfo:
+        with self._lock:
+            return ClientsCacheInfo(
+                self.hits, self.misses, self.maxsize,
+                len(self._clients) if self._clients is not None else 0,
+            )
+
+
+# Resource trees parsed once per api and version, clients are views rebound to their own http
+SHARED_TREES = _BuiltClients(CONSTS.DEFAULT_CLIENTS_CACHE_SIZE)
 
 
 class _ApiBuilder(metaclass=abc.ABCMeta):
@@ -36,7 +138,20 @@ class _ApiBuilder(metaclass=abc.ABCMeta):
 
     _preferred_version_cache: Dict[str, str] = {}
     _discovery = None
+    _discovery_lock = threading.Lock()
     _credentials: Credentials
+    clients_cache_size: int = CONSTS.DEFAULT_CLIENTS_CACHE_SIZE
+    # Attach a thread-safe transport backed by the shared connection pool to built clients
+    pooled_transport: bool = False
+    _token_refresher: Optional[TokenRefresher] = None
+    # Concurrent refreshes of the same credentials share one token request, waiting at most this long
+    single_flight_refresh: bool = True
+    refresh_wait_timeout: float = DEFAULT_WAIT_TIMEOUT
+    # Local daemon minting the tokens of every process on the host, see use_token_broker
+    token_broker: Optional[BrokerClient] = None
+    _broker_spec: Optional[dict] = None
+    # Build clients as views of a resource tree shared by every builder, instead of parsing discovery each time
+    share_discovery_tree: bool = False
 
     # Internal function to load all avaiable APIs based on the scopes
     def _loadApiNames(self, scopes):
@@ -46,6 +161,44 @@ class _ApiBuilder(metaclass=abc.ABCMeta):
             category=DeprecationWarning,
         )
 
+        index = _get_scope_index()
+        if index is None:
+            return self._loadApiNamesFromJson(scopes)
+
+        # Save the raw apiset
+        self.apis = dict()
+        # Instantiated a new dictionary create usable control
+        self.valid_apis = dict()
+
+        # Every lookup is a binary search on the mapped index, api tags are precomputed
+        for x in set(scopes):
+            entry = index.lookup(x)
+            if entry is None:
+                # Log when scope not found
+                logger.warning("[!] SCOPE %s not registered" % x)
+                continue
+
+            self.apis[x] = {
+                'apis': [
+                    {'name': b.name, 'version': b.version, 'preferred': b.preferred}
+                    for b in entry.apis
+                ],
+                'scope': entry.scope,
+            }
+            for b in entry.apis:
+                self._addValidApi(b.tag, b.name, b.version, b.preferred)
+        logger.info("Apis imported")
+
+    def _addValidApi(self, tag, name, version, preferred):
+        if tag in self.valid_apis:
+            if preferred:
+                self.valid_apis[tag][1].insert(0, version)
+            else:
+                self.valid_apis[tag][1].append(version)
+        else:
+            self.valid_apis[tag] = (name, [version])
+
+    def _loadApiNamesFromJson(self, scopes):
         # Create a new dictionary to hold the information
         apiset = dict()
 
@@ -74,59 +227,238 @@ class _ApiBuilder(metaclass=abc.ABCMeta):
 
             # Iterates through all APIs described in the scope relations descriptor
             for b in a['apis']:
-                # Process suffix when there are subidentifier in version
-                suffix = b['version'].split('_v')
-                suffix = "_" + suffix[0] if len(suffix) > 1 else ""
-                api_tag = b['name'] + suffix
-                if api_tag in self.valid_apis:
-                    if b['preferred']:
-                        self.valid_apis[api_tag][1].insert(0, b['version'])
-                    else:
-                        self.valid_apis[api_tag][1].append(b['version'])
-                else:
-                    self.valid_apis[api_tag] = (b['name'], [b['version']])
+                self._addValidApi(api_tag(b['name'], b['version']), b['name'], b['version'], b['preferred'])
+
+    def enable_background_refresh(self,
+                                  margin: float = None,
+                                  jitter: float = None,
+                                  refresher: Optional[TokenRefresher] = None,
+                                  use_asyncio: bool = False) -> TokenRefresher:
+        """Renew the builder token before it expires, on a background thread or asyncio task."""
+        if refresher is None:
+            refresher = TokenRefresher(
+                **{key: value for key, value in (('margin', margin), ('jitter', jitter)) if value is not None}
+            )
+            if use_asyncio:
+                refresher.start_async()
+            else:
+                refresher.start()
+
+        self._token_refresher = refresher
+        if self._credentials is not None:
+            refresher.attach(self._credentials)
+        return refresher
+
+    def use_token_broker(self,
+                         path: Optional[str] = None,
+                         spawn: bool = True,
+                         client: Optional[BrokerClient] = None) -> BrokerClient:
+        """Get tokens from a local broker shared with other processes instead of refreshing them here.
+
+        Needs Unix domain sockets, raises UnsupportedPlatform without them.
+        """
+        if client is None:
+            client = connect_broker(path, spawn)
+        self.token_broker = client
+        self._coordinated_credentials()
+        return client
+
+    def _token_spec(self) -> Optional[dict]:
+        # What the broker needs to mint the builder tokens, None when it cannot
+        if self._broker_spec is not None:
+            return self._broker_spec
+        return user_credentials_spec(self._credentials)
 
     def __call__(self, api, version=None, cache=None):
-        return self.get_api(api, version)
+        return self.get_api(api, version, cache)
+
+    @property
+    def _request_policy(self) -> RequestPolicy:
+        policy = self.__dict__.get('_policy_memo')
+        if policy is None:
+            policy = self.__dict__.setdefault('_policy_memo', RequestPolicy())
+        return policy
+
+    def set_rate_limit(self,
+                       rate: Optional[float] = None,
+                       limiter: Optional[RateLimiter] = None,
+                       **kwargs) -> Optional[RateLimiter]:
+        """Limit the calls per second of built clients, keyword arguments are passed to RateLimiter.
+
+        Without rate nor limiter, the limit is removed.
+        """
+        if limiter is None and rate is not None:
+            limiter = RateLimiter(rate, **kwargs)
+        self._request_policy.set('rate_limiter', limiter)
+        return limiter
+
+    def set_retry_policy(self, policy: Optional[RetryPolicy]) -> Optional[RetryPolicy]:
+        """Retry every request of built clients according to policy, None restores num_retries."""
+        self._request_policy.set('retry_policy', policy)
+        return policy
+
+    def set_response_cache(self, cache: Optional[ResponseCache]) -> Optional[ResponseCache]:
+        """Share identical concurrent reads of built clients and keep their results, None disables it."""
+        self._request_policy.set('response_cache', cache)
+        return cache
+
+    def set_etag_store(self, store: Optional[ETagStore]) -> Optional[ETagStore]:
+        """Revalidate reads of built clients with If-None-Match against store, None disables it."""
+        self._request_policy.set('etag_store', store)
+        return store
+
+    def set_fields(self, api: str, method: str, mask: Optional[str]):
+        """Request only the fields in mask from a method, like set_fields('drive', 'files.list', 'files(id)').
+
+        Applies to clients from get_api and get_api_async alike. Calls passing fields
+        explicitly keep theirs, None removes the mask.
+        """
+        masks = dict(self._request_policy.get('field_masks') or {})
+        if mask is None:
+            masks.pop((api, method), None)
+        else:
+            masks[(api, method)] = mask
+        self._request_policy.set('field_masks', masks)
+
+    def set_request_compression(self, method: str, min_size: Optional[int] = DEFAULT_COMPRESS_MIN_SIZE):
+        """Gzip request bodies of at least min_size bytes sent to an API ("sheets") or method.
+
+        Only enable it for endpoints accepting compressed bodies, None disables it.
+        """
+        methods = dict(self._request_policy.get('compressed_methods') or {})
+        if min_size is None:
+            methods.pop(method, None)
+        else:
+            methods[method] = min_size
+        self._request_policy.set('compressed_methods', methods)
+
+    @staticmethod
+    def transfer_stats(client) -> Optional[TransferStats]:
+        """Requests and bytes sent and received by a built client, None for clients built elsewhere."""
+        counters = getattr(getattr(client, '_requestBuilder', None), 'counters', None)
+        return counters.stats() if counters is not None else None
+
+    @property
+    def _built_clients(self) -> _BuiltClients:
+        # Subclasses do not call the base constructor, so the memo is created on first use
+        clients = self.__dict__.get('_clients_memo')
+        if clients is None:
+            clients = self.__dict__.setdefault(
+                '_clients_memo', _BuiltClients(self.clients_cache_size))
+        return clients
 
     # Function to build connector based on API identifiers
-    def get_api(self, api, version=None, cache=None):
+    def get_api(self, api, version=None, cache=None, pooled_transport=None):
         if cache is None:
             cache = DEFAULT_CACHE
+        if pooled_transport is None:
+            pooled_transport = self.pooled_transport
 
         if version is None:
             version = self.get_preferred_version(api)
+
+        credentials = self._coordinated_credentials()
+        # httplib2 transports are not thread-safe, clients built on them are only reused by their own thread
+        owner = None if pooled_transport else threading.get_ident()
+        return self._built_clients.get_or_build(
+            (api, version, id(credentials), id(cache), pooled_transport, owner),
+            credentials,
+            lambda: self._build_api(api, version, credentials, cache, pooled_transport),
+        )
+
+    def _coordinated_credentials(self):
+        credentials = self._credentials
+        # Credentials that cannot be refreshed, like API keys, are left as they are
+        if not hasattr(credentials, 'refresh'):
+            return credentials
+
+        if self.single_flight_refresh:
+            single_flight(credentials, self.refresh_wait_timeout)
+        if self.token_broker is not None:
+            spec = self._token_spec()
+            if spec is not None:
+                use_broker(credentials, self.token_broker, spec)
+        return credentials
+
+    def _build_api(self, api, version, credentials, cache, pooled_transport=False):
+        if pooled_transport:
+            transport = dict(http=pooled_http(credentials))
+        else:
+            transport = dict(credentials=credentials)
+
+        if self.share_discovery_tree and credentials is not None:
+            template = SHARED_TREES.get_or_build(
+                (api, version, id(cache), HttpRequest),
+                cache,
+                lambda: build(api, version, http=PooledHttp(), cache_discovery=cache is not None, cache=cache),
+            )
+            res = rebind_resource(
+                template,
+                transport.get('http') or AuthorizedHttp(credentials, http=build_http()),
+                RequestBuilder(self._request_policy, api),
+            )
+            logger.debug("%s API bound to credentials" % api)
+            return res
+
         res = build(
             api,
             version,
-            credentials=self._credentials,
             cache_discovery=cache is not None,
             cache=cache,
+            requestBuilder=RequestBuilder(self._request_policy, api),
+            **transport
         )
         logger.info("%s API Generated" % api)
         return res
 
+    def batch(self, api, version=None, **kwargs) -> BatchEngine:
+        """Create a batching engine for requests of an api name or built client."""
+        client = self.get_api(api, version) if isinstance(api, str) else api
+        return BatchEngine(client.new_batch_http_request, **kwargs)
+
+    def iterate(self, request, items_key='items', **kwargs):
+        """Yield the items of every page of a list request, prefetching following pages in background."""
+        return pagination.iterate(request, items_key, **kwargs)
+
+    def download(self, request, destination, **kwargs) -> media.DownloadStats:
+        """Download the media of a request with concurrent range requests into a file path or buffer."""
+        return media.download(request, destination, **kwargs)
+
+    def invalidate_api(self, api: Optional[str] = None, version: Optional[str] = None):
+        """Drop memoized clients, optionally only those of the given api and version."""
+        self._built_clients.invalidate(api, version)
+        SHARED_TREES.invalidate(api, version)
+
+    def api_cache_info(self) -> ClientsCacheInfo:
+        """Report hits, misses and size of the memoized clients."""
+        return self._built_clients.info()
+
     @classmethod
     def get_preferred_version(cls, api):
-        if api not in cls._preferred_version_cache:
-            discovery = cls.get_discovery()
-            apis_res = discovery.apis()
-            res = apis_res.list(name=api, preferred=True).execute()
-            items = res.get('items', [])
-            if len(items) == 0:
-                raise UnknownPreferredVersion(api)
-            if len(items) > 1:
-                raise UncertainPreferredVersion(api)
-            cls._preferred_version_cache[api] = items[0]['version']
-        return cls._preferred_version_cache[api]
+        # Versions set by hand take precedence over the index
+        if api in cls._preferred_version_cache:
+            return cls._preferred_version_cache[api]
+        return PREFERRED_VERSIONS.get(api)
+
+    @classmethod
+    def _list_preferred_apis(cls):
+        discovery = cls.get_discovery()
+        res = discovery.apis().list(preferred=True, fields='items(name,version)').execute()
+        return res.get('items', [])
 
     @classmethod
     def get_discovery(cls):
+        # Shared by every thread, so it uses the thread-safe transport
         if cls._discovery is None:
-            cls._discovery = build('discovery', 'v1', cache=DEFAULT_CACHE)
+            with cls._discovery_lock:
+                if cls._discovery is None:
+                    cls._discovery = build('discovery', 'v1', http=PooledHttp(), cache=DEFAULT_CACHE)
         return cls._discovery
 
 
+PREFERRED_VERSIONS = PreferredVersionIndex(lambda: _ApiBuilder._list_preferred_apis())
+
+
 def _get_registered_apis():
     global __registered_apis
     if __registered_apis is None:
@@ -137,4 +469,15 @@ def _get_registered_apis():
     return __registered_apis
 
 
+def _get_scope_index() -> Optional[ScopeIndex]:
+    global __scope_index
+    if __scope_index is None and os.path.isfile(DEFAULT_INDEX_PATH):
+        try:
+            __scope_index = ScopeIndex(DEFAULT_INDEX_PATH)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not open scope index, falling back to apis.json: %s", e)
+    return __scope_index
+
+
 __registered_apis = None
+__scope_index = None
@@ -26,7 +26,7 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
 from .base import _ApiBuilder
-from ..config.scope_scrap import get_scopes_short_map
+from ..config.scopes import resolve_scope
 from ..constants import Auth, CONSTS
 from ..credentials_storage.base import BaseStorage
 
@@ -59,7 +59,7 @@ class oauth2(_ApiBuilder):
 
         # Save all scopes results
         self.SCOPES = list({
-            get_scopes_short_map().get(scope, scope)
+            resolve_scope(scope)
             for scope in scopes
         })
 
@@ -132,6 +132,8 @@ class oauth2(_ApiBuilder):
     @credentials.setter
     def credentials(self, new_credentials: Credentials):
         self._credentials = new_credentials
+        if self._token_refresher is not None and new_credentials is not None:
+            self._token_refresher.attach(new_credentials)
 
     @classmethod
     def default(cls):
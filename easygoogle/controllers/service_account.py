@@ -14,23 +14,38 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import json
 import logging
 import warnings
-from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
 
 import google.auth
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 
-from .base import _ApiBuilder
-from ..config.scope_scrap import get_scopes_short_map
+from .base import ClientsCacheInfo, _ApiBuilder, _BuiltClients
+from ..config.scopes import resolve_scope
+from ..constants import CONSTS
+from ..policy import RequestPolicy
+from ..tokens.utils import seconds_to_expiry
+from ..transport import default_session
 
 logger = logging.getLogger(__name__)
 _deprecation_dummy = object()
 
 
+DEFAULT_PREMINT_WORKERS = 16
+# Tokens expiring within this many seconds are minted again
+PREMINT_MARGIN = 5 * 60
+
+
 class ServiceAccount(_ApiBuilder):
     """Handler for service account authentication."""
 
+    # Delegated builders kept per subject, 0 creates a new one on every delegate call
+    delegation_pool_size: int = CONSTS.DEFAULT_DELEGATION_POOL_SIZE
+
     # noinspection PyPep8Naming
     def __init__(self,
                  service_file: Optional[Union[str, dict]],
@@ -52,10 +67,11 @@ class ServiceAccount(_ApiBuilder):
 
         # Save all scopes results
         self.SCOPES = list({
-            get_scopes_short_map().get(scope, scope)
+            resolve_scope(scope)
             for scope in scopes
         })
 
+        self._service_file = service_file
         # Acquire credentials from JSON key file
         if service_file is not None:
             if isinstance(service_file, dict):
@@ -82,14 +98,82 @@ class ServiceAccount(_ApiBuilder):
     def default(cls, scopes=('cloud-platform',), **kwargs):
         return cls(None, scopes, **kwargs)
 
+    @property
+    def _delegation_pool(self) -> _BuiltClients:
+        pool = self.__dict__.get('_delegation_memo')
+        if pool is None:
+            pool = self.__dict__.setdefault('_delegation_memo', _BuiltClients(self.delegation_pool_size))
+        return pool
+
+    def _token_spec(self) -> Optional[dict]:
+        if self._service_file is None:
+            return {'type': 'default', 'scopes': sorted(self.SCOPES)}
+
+        info = self._service_file
+        if not isinstance(info, dict):
+            with open(info, 'r') as fl:
+                info = self._service_file = json.load(fl)
+        return {'type': 'service_account', 'info': info, 'scopes': sorted(self.SCOPES)}
+
     def delegate(self, user):
-        """Delegate authorization using application impersonation of authority."""
+        """Delegate authorization using application impersonation of authority.
+
+        Builders are pooled per subject, so their tokens and clients are reused until evicted.
+        """
+        # Entries are bound to the current credentials, replacing them discards the pool
+        return self._delegation_pool.get_or_build(user, self._credentials, lambda: self._new_delegate(user))
+
+    def _new_delegate(self, user):
         # Instantiate delegated handler
-        res = _delegated(
-            self.credentials.with_subject(user), self.valid_apis)
+        res = self._delegated_builder(self.credentials.with_subject(user))
+        res.single_flight_refresh = self.single_flight_refresh
+        res.refresh_wait_timeout = self.refresh_wait_timeout
+        res.share_discovery_tree = self.share_discovery_tree
+        res.__dict__['_policy_memo'] = RequestPolicy(self._request_policy, subject=user)
+        if self.token_broker is not None:
+            res.token_broker = self.token_broker
+            res._broker_spec = dict(self._token_spec(), subject=user)
+        res._coordinated_credentials()
+        if self._token_refresher is not None:
+            res.enable_background_refresh(refresher=self._token_refresher)
         logger.info("Created delegated credentials")
         return res
 
+    def premint(self,
+                users: Iterable[str],
+                max_workers: int = DEFAULT_PREMINT_WORKERS,
+                margin: float = PREMINT_MARGIN) -> Dict[str, Exception]:
+        """Mint delegated tokens ahead of time, at most max_workers at once.
+
+        Subjects holding a token valid for longer than margin seconds are skipped. Only as many
+        subjects as delegation_pool_size keep their tokens afterwards.
+        Returns the errors of the subjects that could not be minted.
+        """
+        request = Request(session=default_session())
+
+        def mint(user):
+            credentials = self.delegate(user).credentials
+            remaining = seconds_to_expiry(credentials)
+            if remaining is not None and remaining <= margin:
+                credentials.refresh(request)
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {user: executor.submit(mint, user) for user in set(users)}
+            for user, future in futures.items():
+                error = future.exception()
+                if error is not None:
+                    logger.warning("Could not mint token for %s: %s", user, error)
+                    errors[user] = error
+        return errors
+
+    def delegation_pool_info(self) -> ClientsCacheInfo:
+        """Report hits, misses and size of the pooled delegated builders."""
+        return self._delegation_pool.info()
+
+    def _delegated_builder(self, dCredentials):
+        return _delegated(dCredentials, getattr(self, 'valid_apis', None))
+
 
 class _delegated(_ApiBuilder):
     # Delegated class, created from service account application impersonation
@@ -14,7 +14,7 @@
 
 import abc
 import hashlib
-from typing import Optional
+from typing import Dict, Iterable, Mapping, Optional
 
 from google.oauth2.credentials import Credentials
 
@@ -38,6 +38,14 @@ class BaseStorage(metaclass=abc.ABCMeta):
     def has(self, client_id: str, user: str) -> bool:
         raise NotImplementedError()
 
+    def get_many(self, client_id: str, users: Iterable[str]) -> Dict[str, Optional[Credentials]]:
+        """Credentials of every user, None for those not stored."""
+        return {user: self.get(client_id, user) for user in users}
+
+    def save_many(self, client_id: str, credentials: Mapping[str, Credentials]):
+        for user, user_credentials in credentials.items():
+            self.save(client_id, user, user_credentials)
+
     @staticmethod
     def _unique_key(client_id: str, user: str) -> str:
-        return hashlib.sha256(f"{client_id}-{user}").hexdigest().decode()
+        return hashlib.sha256(f"{client_id}-{user}".encode('utf-8')).hexdigest()
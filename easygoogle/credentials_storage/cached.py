@@ -0,0 +1,119 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import threading
+from typing import Dict, Iterable, Mapping, Optional
+
+from cachetools import TTLCache
+from google.oauth2.credentials import Credentials
+
+from .base import BaseStorage
+from .utils import credentials_from_dict, credentials_to_dict
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 5 * 60
+DEFAULT_NEGATIVE_TTL = 30
+
+
+class CachedStorage(BaseStorage):
+    """Keeps recently used credentials of another storage in memory.
+
+    Users found missing are remembered for negative_ttl seconds, so repeated lookups
+    of unknown users do not reach the backend either.
+    """
+
+    def __init__(self,
+                 backend: BaseStorage,
+                 maxsize: int = DEFAULT_MAXSIZE,
+                 ttl: float = DEFAULT_TTL,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        super(CachedStorage, self).__init__()
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._found = TTLCache(maxsize, ttl)
+        self._missing = TTLCache(maxsize, negative_ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def store_token(self) -> bool:
+        return self.backend.store_token
+
+    def get(self, client_id: str, user: str) -> Optional[Credentials]:
+        return self.get_many(client_id, (user,))[user]
+
+    def get_many(self, client_id: str, users: Iterable[str]) -> Dict[str, Optional[Credentials]]:
+        result: Dict[str, Optional[Credentials]] = {}
+        pending = []
+        with self._lock:
+            for user in users:
+                key = (client_id, user)
+                if key in self._found:
+                    result[user] = self._found[key]
+                elif key in self._missing:
+                    result[user] = None
+                else:
+                    pending.append(user)
+                    continue
+                self.hits += 1
+            self.misses += len(pending)
+
+        if not pending:
+            return result
+
+        loaded = self.backend.get_many(client_id, pending)
+        with self._lock:
+            for user, credentials in loaded.items():
+                self._remember(client_id, user, credentials)
+        result.update(loaded)
+        return result
+
+    def save(self, client_id: str, user: str, credentials: Credentials):
+        self.backend.save(client_id, user, credentials)
+        with self._lock:
+            self._remember(client_id, user, self._stored(credentials))
+
+    def save_many(self, client_id: str, credentials: Mapping[str, Credentials]):
+        self.backend.save_many(client_id, credentials)
+        with self._lock:
+            for user, user_credentials in credentials.items():
+                self._remember(client_id, user, self._stored(user_credentials))
+
+    def has(self, client_id: str, user: str) -> bool:
+        return self.get(client_id, user) is not None
+
+    def invalidate(self, client_id: Optional[str] = None, user: Optional[str] = None):
+        """Forget cached entries, all of them or only those of a client or user."""
+        with self._lock:
+            for cache in (self._found, self._missing):
+                for key in list(cache.keys()):
+                    if client_id is not None and key[0] != client_id:
+                        continue
+                    if user is not None and key[1] != user:
+                        continue
+                    cache.pop(key, None)
+
+    def _stored(self, credentials: Credentials) -> Credentials:
+        # Cache what the backend would give back, not the live object with its token
+        if self.store_token:
+            return credentials
+        return credentials_from_dict(credentials_to_dict(credentials, store_token=False), load_token=False)
+
+    def _remember(self, client_id, user, credentials):
+        key = (client_id, user)
+        if credentials is None:
+            self._found.pop(key, None)
+            self._missing[key] = True
+        else:
+            self._missing.pop(key, None)
+            self._found[key] = credentials
@@ -29,10 +29,11 @@ class FileStore(BaseStorage):
         self.store_token = store_token
 
     def get(self, client_id: str, user: str) -> Optional[Credentials]:
-        if not self.has(client_id, user):
-            return None
         key = self._unique_key(client_id, user)
+        # A single lookup, pickledb answers False for missing keys
         stored = self.db.get(key)
+        if not stored:
+            return None
         return credentials_from_dict(stored, load_token=self.store_token)
 
     def save(self, client_id: str, user: str, credentials: Credentials):
@@ -0,0 +1,148 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from google.oauth2.credentials import Credentials
+
+from .base import BaseStorage, StorageError
+from .utils import credentials_to_dict, credentials_from_dict
+
+DEFAULT_BUSY_TIMEOUT = 30.0
+# Stays below the bound parameters limit of older SQLite builds
+MAX_QUERY_KEYS = 500
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS credentials (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID
+'''
+
+_UPSERT = (
+    'INSERT INTO credentials (key, data, updated) VALUES (?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET data = excluded.data, updated = excluded.updated'
+)
+
+
+class SQLiteStore(BaseStorage):
+    """Credentials stored in a SQLite database, safe to share between threads and processes.
+
+    Every lookup is a primary key search and every save a single row upsert.
+    Writers waiting on a lock give up after busy_timeout seconds.
+    """
+
+    def __init__(self, path: str, store_token: bool = True, busy_timeout: float = DEFAULT_BUSY_TIMEOUT):
+        super(SQLiteStore, self).__init__()
+        self.path = path
+        self.store_token = store_token
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connect()
+
+    def get(self, client_id: str, user: str) -> Optional[Credentials]:
+        row = self._execute(
+            'SELECT data FROM credentials WHERE key = ?',
+            (self._unique_key(client_id, user),),
+        ).fetchone()
+        if row is None:
+            return None
+        return credentials_from_dict(json.loads(row[0]), load_token=self.store_token)
+
+    def save(self, client_id: str, user: str, credentials: Credentials):
+        data = json.dumps(credentials_to_dict(credentials, store_token=self.store_token))
+        self._execute(_UPSERT, (self._unique_key(client_id, user), data, time.time()))
+
+    def get_many(self, client_id: str, users: Iterable[str]) -> Dict[str, Optional[Credentials]]:
+        keys = {self._unique_key(client_id, user): user for user in users}
+        result: Dict[str, Optional[Credentials]] = dict.fromkeys(keys.values())
+
+        pending: List[str] = list(keys)
+        for start in range(0, len(pending), MAX_QUERY_KEYS):
+            chunk = pending[start:start + MAX_QUERY_KEYS]
+            rows = self._execute(
+                'SELECT key, data FROM credentials WHERE key IN (%s)' % ', '.join('?' * len(chunk)),
+                chunk,
+            ).fetchall()
+            for key, data in rows:
+                result[keys[key]] = credentials_from_dict(json.loads(data), load_token=self.store_token)
+        return result
+
+    def save_many(self, client_id: str, credentials: Mapping[str, Credentials]):
+        now = time.time()
+        rows = [
+            (
+                self._unique_key(client_id, user),
+                json.dumps(credentials_to_dict(user_credentials, store_token=self.store_token)),
+                now,
+            )
+            for user, user_credentials in credentials.items()
+        ]
+
+        connection = self._connect()
+        try:
+            # One write transaction for the whole batch
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(_UPSERT, rows)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError as e:
+            raise StorageError("Credentials database %s: %s" % (self.path, e)) from e
+
+    def has(self, client_id: str, user: str) -> bool:
+        return self._execute(
+            'SELECT 1 FROM credentials WHERE key = ?',
+            (self._unique_key(client_id, user),),
+        ).fetchone() is not None
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are not shared between threads, nor inherited by forked processes
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        try:
+            # Autocommit, each statement is its own transaction
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA busy_timeout = %d' % int(self.busy_timeout * 1000))
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(_SCHEMA)
+        except sqlite3.Error as e:
+            raise StorageError("Could not open credentials database %s: %s" % (self.path, e)) from e
+
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        try:
+            return self._connect().execute(sql, parameters)
+        except sqlite3.OperationalError as e:
+            # Raised once the busy timeout expires on a locked database
+            raise StorageError("Credentials database %s: %s" % (self.path, e)) from e
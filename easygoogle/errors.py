@@ -32,3 +32,32 @@ class UncertainPreferredVersion(UnknownPreferredVersion):
             f'The api "{self.api}" has multiple preferred versions, probably it an api macro group. '
             'In this situation it is mandatory to specify a version.'
         )
+
+
+class RefreshTimeout(EasygoogleError):
+    def __init__(self, timeout):
+        super(RefreshTimeout, self).__init__(timeout)
+        self.timeout = timeout
+
+    def __str__(self):
+        return f'Gave up waiting for a token refresh after {self.timeout} seconds'
+
+
+class ChecksumMismatch(EasygoogleError):
+    def __init__(self, algorithm, expected, actual):
+        super(ChecksumMismatch, self).__init__(algorithm, expected, actual)
+        self.algorithm = algorithm
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return f'Downloaded content has {self.algorithm} {self.actual}, expected {self.expected}'
+
+
+class UnsupportedPlatform(EasygoogleError):
+    def __init__(self, feature):
+        super(UnsupportedPlatform, self).__init__(feature)
+        self.feature = feature
+
+    def __str__(self):
+        return f'{self.feature} is not supported on this platform'
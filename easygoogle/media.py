@@ -0,0 +1,275 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import base64
+import hashlib
+import logging
+import mmap
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+import httplib2
+import requests
+from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+
+from .errors import ChecksumMismatch
+from .transport import default_session
+
+try:
+    import google_crc32c
+except ImportError:  # pragma: no cover
+    google_crc32c = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+RETRYABLE_STATUS = frozenset((408, 429, 500, 502, 503, 504))
+
+_CONTENT_RANGE = re.compile(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)')
+
+
+class DownloadStats(NamedTuple):
+    size: int
+    ranges: int
+    # Ranges continued after a failure, from the last byte received
+    resumed: int
+    # Checksum algorithms verified, empty when the API provides none
+    verified: Tuple[str, ...]
+
+
+class _Retry(Exception):
+    pass
+
+
+class _RangedDownload(object):
+    """Fetches ranges of a media GET straight into a writable view."""
+
+    def __init__(self, uri, headers, session, credentials, num_retries, timeout):
+        self.uri = uri
+        self.headers = dict(headers)
+        # Ranges must address the stored bytes, not an encoding of them
+        self.headers['accept-encoding'] = 'identity'
+        self.headers.pop('content-length', None)
+        self.session = session
+        self.credentials = credentials
+        self.num_retries = num_retries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.resumed = 0
+
+    def open(self, start, end):
+        """Response to a range request, end included."""
+        headers = dict(self.headers)
+        headers['range'] = 'bytes=%d-%d' % (start, end)
+        if self.credentials is not None:
+            self.credentials.before_request(Request(self.session), 'GET', self.uri, headers)
+
+        try:
+            res = self.session.get(self.uri, headers=headers, stream=True, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise _Retry(str(e)) from e
+
+        if res.status_code == 401 and self.credentials is not None:
+            res.close()
+            self.credentials.refresh(Request(self.session))
+            raise _Retry('unauthorized')
+        if res.status_code in RETRYABLE_STATUS:
+            res.close()
+            raise _Retry('status %d' % res.status_code)
+        if res.status_code >= 300 and res.status_code != 416:
+            content = res.content
+            info = {key.lower(): value for key, value in res.headers.items()}
+            info['status'] = str(res.status_code)
+            raise HttpError(httplib2.Response(info), content, uri=self.uri)
+        return res
+
+    def fill(self, view: memoryview, start: int, res=None):
+        """Write the bytes of the range starting at start into view, resuming after failures."""
+        written = 0
+        attempt = 0
+        while written < len(view):
+            try:
+                if res is None:
+                    res = self.open(start + written, start + len(view) - 1)
+                try:
+                    while written < len(view):
+                        count = res.raw.readinto(view[written:])
+                        if not count:
+                            raise _Retry('connection closed after %d bytes' % written)
+                        written += count
+                except (requests.exceptions.RequestException, OSError) as e:
+                    raise _Retry(str(e)) from e
+                finally:
+                    res.close()
+                    res = None
+            except _Retry as e:
+                if attempt >= self.num_retries:
+                    raise
+                attempt += 1
+                if written:
+                    with self._lock:
+                        self.resumed += 1
+                delay = random.random() * 2 ** attempt
+                logger.warning("Resuming range at %d after %.2f seconds, retry %d of %d: %s",
+                               start + written, delay, attempt, self.num_retries, e)
+                time.sleep(delay)
+
+    def probe(self, chunk_size):
+        """First range response, its content range and the full size.
+
+        The first item is the content itself when it was read in full to learn its size.
+        """
+        attempt = 0
+        while True:
+            try:
+                res = self.open(0, chunk_size - 1)
+                break
+            except _Retry:
+                if attempt >= self.num_retries:
+                    raise
+                attempt += 1
+                time.sleep(random.random() * 2 ** attempt)
+
+        if res.status_code == 416:
+            # Ranges of an empty object are not satisfiable
+            res.close()
+            return None, 0, 0, res.headers
+        if res.status_code == 200:
+            # The range was ignored, the whole content comes in this response
+            length = res.headers.get('content-length')
+            if length is None:
+                # Streamed without a length, the size is only known once it is all read
+                try:
+                    content = res.content
+                finally:
+                    res.close()
+                return content, len(content), len(content), res.headers
+            size = int(length)
+            return res, size, size, res.headers
+
+        match = _CONTENT_RANGE.fullmatch(res.headers.get('content-range', ''))
+        if match is None or match.group(3) == '*':
+            res.close()
+            raise ValueError("Unexpected content range %r" % res.headers.get('content-range'))
+        return res, int(match.group(2)) + 1, int(match.group(3)), res.headers
+
+
+def _goog_hashes(headers) -> dict:
+    # x-goog-hash: crc32c=n03x6A==,md5=Ojk9c3dhfxgoKVVHYwFbHQ==
+    hashes = {}
+    for value in headers.get('x-goog-hash', '').split(','):
+        algorithm, _, digest = value.strip().partition('=')
+        if digest:
+            hashes[algorithm] = digest
+    return hashes
+
+
+def _verify(view: memoryview, hashes: dict, md5: Optional[str]) -> Tuple[str, ...]:
+    expected = {}
+    if md5 is not None:
+        expected['md5'] = md5.lower()
+    elif 'md5' in hashes:
+        expected['md5'] = base64.b64decode(hashes['md5']).hex()
+    if 'crc32c' in hashes and google_crc32c is not None:
+        expected['crc32c'] = base64.b64decode(hashes['crc32c']).hex()
+
+    for algorithm, digest in expected.items():
+        if algorithm == 'md5':
+            actual = hashlib.md5(view).hexdigest()
+        else:
+            actual = google_crc32c.Checksum(view).digest().hex()
+        if actual != digest:
+            raise ChecksumMismatch(algorithm, digest, actual)
+    return tuple(sorted(expected))
+
+
+def _credentials_and_session(http):
+    credentials = getattr(http, 'credentials', None)
+    inner = getattr(http, 'http', http)
+    session = getattr(inner, 'session', None)
+    return credentials, session if isinstance(session, requests.Session) else default_session()
+
+
+def download(request,
+             destination,
+             chunk_size: int = DEFAULT_CHUNK_SIZE,
+             max_workers: int = DEFAULT_WORKERS,
+             num_retries: int = DEFAULT_RETRIES,
+             md5: Optional[str] = None,
+             session: Optional[requests.Session] = None,
+             timeout: Optional[float] = None) -> DownloadStats:
+    """Download the media of request with concurrent range requests.
+
+    destination is either a path, preallocated to the full size and written through mmap,
+    or a writable buffer at least as large as the media. Each range is read straight into
+    its slice of the destination and resumed from its last byte when it fails.
+    The content is checked against md5, a hex digest, or against x-goog-hash when present.
+    """
+    if request.method != 'GET':
+        raise ValueError("Only media GET requests can be downloaded in ranges")
+
+    credentials, pooled = _credentials_and_session(request.http)
+    fetcher = _RangedDownload(request.uri, request.headers, session or pooled, credentials, num_retries, timeout)
+    first, first_end, size, headers = fetcher.probe(chunk_size)
+
+    mapped = fl = None
+    if isinstance(destination, (str, os.PathLike)):
+        fl = open(destination, 'w+b')
+        fl.truncate(size)
+        if size:
+            mapped = mmap.mmap(fl.fileno(), size)
+        view = memoryview(mapped if mapped is not None else bytearray())
+    else:
+        view = memoryview(destination).cast('B')
+        if view.readonly or len(view) < size:
+            raise ValueError("destination must be a writable buffer of at least %d bytes" % size)
+        view = view[:size]
+
+    ranges = [(start, min(start + chunk_size, size)) for start in range(first_end, size, chunk_size)]
+    buffered = isinstance(first, bytes)
+    # The probed range is read by the pool too, alongside the others
+    jobs = [(0, first_end, first)] if first is not None and not buffered else []
+    jobs.extend((start, end, None) for start, end in ranges)
+    try:
+        if buffered:
+            view[:] = first
+        if jobs:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+                futures = [pool.submit(fetcher.fill, view[start:end], start, res) for start, end, res in jobs]
+                for future in futures:
+                    future.result()
+
+        verified = _verify(view, _goog_hashes(headers), md5)
+        if mapped is not None:
+            mapped.flush()
+    finally:
+        view.release()
+        if mapped is not None:
+            try:
+                mapped.close()
+            except BufferError:
+                # Slices are still referenced by the traceback of a failed range, closed once collected
+                pass
+        if fl is not None:
+            fl.close()
+
+    return DownloadStats(size, len(jobs) + (1 if buffered else 0), fetcher.resumed, verified)
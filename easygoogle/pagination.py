@@ -0,0 +1,120 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import copy
+import json
+import queue
+import threading
+import urllib.parse
+from typing import Iterator, Optional
+
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.http import build_http
+
+from .transport import is_thread_safe
+
+DEFAULT_PREFETCH = 2
+
+_PAGE = 'page'
+_ERROR = 'error'
+_DONE = 'done'
+
+
+def next_page(request, response, page_token_param='pageToken', next_page_token_key='nextPageToken'):
+    """Copy of request asking for the page after response, None on the last page."""
+    token = response.get(next_page_token_key)
+    if not token:
+        return None
+
+    request = copy.copy(request)
+    request.headers = dict(request.headers)
+    if request.method == 'GET':
+        parsed = urllib.parse.urlparse(request.uri)
+        query = [
+            (key, value)
+            for key, value in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+            if key != page_token_param
+        ]
+        query.append((page_token_param, token))
+        request.uri = urllib.parse.urlunparse(parsed._replace(query=urllib.parse.urlencode(query)))
+    else:
+        body = json.loads(request.body) if request.body else {}
+        body[page_token_param] = token
+        request.body = json.dumps(body)
+        request.body_size = len(request.body)
+        request.headers['content-length'] = str(request.body_size)
+    return request
+
+
+def _private_http(http):
+    # httplib2 based transports cannot be shared with the consuming thread
+    if is_thread_safe(http):
+        return http
+    private = build_http()
+    credentials = getattr(http, 'credentials', None)
+    if credentials is None:
+        return private
+    return AuthorizedHttp(credentials, http=private)
+
+
+def iterate(request,
+            items_key: str = 'items',
+            prefetch: int = DEFAULT_PREFETCH,
+            num_retries: int = 0,
+            page_token_param: str = 'pageToken',
+            next_page_token_key: str = 'nextPageToken',
+            http=None) -> Iterator:
+    """Yield the items of every page of a list request.
+
+    Following pages are fetched on a background thread while the current one is consumed.
+    At most prefetch pages are held in memory waiting to be consumed.
+    """
+    pages = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+    http = _private_http(http if http is not None else request.http)
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        current: Optional[object] = request
+        try:
+            while current is not None and not stop.is_set():
+                response = current.execute(http=http, num_retries=num_retries)
+                if not put((_PAGE, response.get(items_key, ()))):
+                    return
+                current = next_page(current, response, page_token_param, next_page_token_key)
+        except Exception as e:
+            put((_ERROR, e))
+        else:
+            put((_DONE, None))
+
+    producer = threading.Thread(target=produce, name='easygoogle-pagination', daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, value = pages.get()
+            if kind is _DONE:
+                return
+            if kind is _ERROR:
+                raise value
+            yield from value
+    finally:
+        stop.set()
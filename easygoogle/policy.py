@@ -0,0 +1,265 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Settings applied to every request of the clients built by a builder.
+#
+# Clients are built with PolicyHttpRequest as request class, bound to the policy of their builder.
+# The policy is looked up when a request executes, so settings changed later apply to clients built before.
+# Layers, outermost first: response cache, retries, ETag revalidation, rate limit, compression.
+
+import copy
+import gzip
+import itertools
+import threading
+import urllib.parse
+from typing import NamedTuple, Optional
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from .ratelimit import is_rate_limited
+from .utils import method_setting
+
+DEFAULT_COMPRESS_MIN_SIZE = 1024
+
+
+class RequestPolicy(object):
+    """Request settings of a builder, falling back to those of its parent for delegated builders."""
+
+    _ids = itertools.count()
+
+    def __init__(self, parent: Optional['RequestPolicy'] = None, subject: Optional[str] = None):
+        self.parent = parent
+        self.subject = subject
+        self._settings = {}
+        # Tells apart the credentials of unrelated builders sharing a cache
+        self._id = next(self._ids) if parent is None else parent._id
+
+    @property
+    def identity(self):
+        return self._id, self.subject
+
+    def get(self, name: str, default=None):
+        if name in self._settings:
+            return self._settings[name]
+        if self.parent is not None:
+            return self.parent.get(name, default)
+        return default
+
+    def set(self, name: str, value):
+        self._settings[name] = value
+
+
+class TransferStats(NamedTuple):
+    requests: int
+    # Request bodies before and after compression
+    sent: int
+    sent_wire: int
+    # Response bodies after and before decompression
+    received: int
+    received_wire: int
+
+
+class TransferCounters(object):
+    """Bytes exchanged by the requests of a client.
+
+    Compressed response sizes are only known with the pooled transport, httplib2 transports
+    report decompressed sizes for both.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = [0] * len(TransferStats._fields)
+
+    def stats(self) -> TransferStats:
+        with self._lock:
+            return TransferStats(*self._values)
+
+    def count_request(self, sent: int, sent_wire: int):
+        with self._lock:
+            self._values[0] += 1
+            self._values[1] += sent
+            self._values[2] += sent_wire
+
+    def count_response(self, response, content):
+        received = len(content or b'')
+        wire = response.get('-wire-length') if response is not None else None
+        with self._lock:
+            self._values[3] += received
+            self._values[4] += int(wire) if wire is not None else received
+
+
+def negotiate_gzip(headers: dict) -> dict:
+    """Google APIs only compress responses for clients announcing gzip in both headers."""
+    encodings = headers.get('accept-encoding')
+    if not encodings:
+        headers['accept-encoding'] = 'gzip'
+    elif 'gzip' not in encodings:
+        headers['accept-encoding'] = encodings + ', gzip'
+
+    agent = headers.get('user-agent', '')
+    if 'gzip' not in agent:
+        headers['user-agent'] = (agent + ' (gzip)').strip()
+    return headers
+
+
+class PolicyHttpRequest(HttpRequest):
+    """HttpRequest applying the policy of the builder that created its client."""
+
+    def __init__(self, policy: RequestPolicy, *args, counters: Optional[TransferCounters] = None, **kwargs):
+        super(PolicyHttpRequest, self).__init__(*args, **kwargs)
+        self.policy = policy
+        self.counters = counters
+
+    def execute(self, http=None, num_retries=0):
+        cache = self.policy.get('response_cache')
+        if cache is None or not self._cacheable():
+            return self._execute(http, num_retries)
+
+        key = (self.policy.identity, self.methodId, self.uri, self.body)
+        return cache.get_or_fetch(key, self.methodId or '', lambda: self._execute(http, num_retries))
+
+    def _execute(self, http=None, num_retries=0):
+        retry = self.policy.get('retry_policy')
+        if retry is None:
+            return self._send(http, num_retries)
+        # The policy replaces the retries of googleapiclient
+        return retry.call(self._send, http or self.http, self.method, self.methodId or self.method)
+
+    def _send(self, http=None, num_retries=0):
+        etags = self.policy.get('etag_store')
+        if etags is None or not self._cacheable():
+            return self._send_once(http, num_retries)
+
+        key = (self.policy.identity, self.uri)
+        stored = etags.get(key)
+        postproc = self.postproc
+
+        def remember(response, content):
+            etag = response.get('etag')
+            if etag:
+                etags.put(key, etag, response, content)
+            return postproc(response, content)
+
+        request = copy.copy(self)
+        request.headers = dict(self.headers)
+        request.postproc = remember
+        if stored is not None:
+            request.headers['if-none-match'] = stored.etag
+
+        try:
+            return request._send_once(http, num_retries)
+        except HttpError as e:
+            if stored is None or e.resp.status != 304:
+                raise
+        etags.revalidated(key)
+        return postproc(stored.response, stored.content)
+
+    def _send_once(self, http=None, num_retries=0):
+        limiter = self.policy.get('rate_limiter')
+        if limiter is None:
+            return self._transfer(http, num_retries)
+
+        bucket = limiter.bucket(self.methodId or self.method, self.policy.subject)
+        bucket.acquire()
+        try:
+            return self._transfer(http, num_retries)
+        except Exception as e:
+            if is_rate_limited(e):
+                bucket.penalize()
+            raise
+
+    def _transfer(self, http=None, num_retries=0):
+        # Works on a copy, retries start again from the original body
+        request = copy.copy(self)
+        request.headers = negotiate_gzip(dict(self.headers))
+
+        body = self.body.encode('utf-8') if isinstance(self.body, str) else self.body
+        sent = sent_wire = len(body or b'')
+        min_size = method_setting(self.policy.get('compressed_methods') or {}, self.methodId or '')
+        if (min_size is not None and body and sent >= min_size and not self.resumable
+                and 'content-encoding' not in request.headers):
+            request.body = gzip.compress(body)
+            request.body_size = sent_wire = len(request.body)
+            request.headers['content-encoding'] = 'gzip'
+            request.headers['content-length'] = str(sent_wire)
+
+        counters = self.counters
+        if counters is None:
+            return HttpRequest.execute(request, http=http, num_retries=num_retries)
+
+        postproc = self.postproc
+
+        def count(response, content):
+            counters.count_response(response, content)
+            return postproc(response, content)
+
+        request.postproc = count
+        counters.count_request(sent, sent_wire)
+        try:
+            return HttpRequest.execute(request, http=http, num_retries=num_retries)
+        except HttpError as e:
+            counters.count_response(e.resp, e.content)
+            raise
+
+    def _cacheable(self) -> bool:
+        # Media downloads are not kept in memory
+        return self.method == 'GET' and 'alt=media' not in self.uri
+
+    def to_json(self):
+        # The policy belongs to the process, it is not serialized
+        clone = copy.copy(self)
+        del clone.policy
+        del clone.counters
+        return HttpRequest.to_json(clone)
+
+
+def with_fields(uri: str, mask: str) -> str:
+    """Add a fields parameter to uri, unless it already has one or downloads media."""
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(uri).query)
+    if 'fields' in query or 'media' in query.get('alt', ()):
+        return uri
+    separator = '&' if '?' in uri else '?'
+    return uri + separator + urllib.parse.urlencode({'fields': mask})
+
+
+def apply_field_mask(request: HttpRequest, policy: RequestPolicy, api: Optional[str]) -> HttpRequest:
+    """Add the field mask registered for the method of request to its uri."""
+    masks = policy.get('field_masks')
+    if masks and request.methodId:
+        # Method ids are prefixed by the API name, not always the one used to build the client
+        mask = masks.get((api, request.methodId.split('.', 1)[-1]))
+        if mask:
+            request.uri = with_fields(request.uri, mask)
+    return request
+
+
+class RequestBuilder(object):
+    """requestBuilder given to googleapiclient, creating requests bound to a policy.
+
+    Requests of methods with a registered field mask get it as fields parameter, follow-up
+    pages created by list_next copy it along.
+    """
+
+    def __init__(self, policy: RequestPolicy, api: Optional[str] = None):
+        self.policy = policy
+        self.api = api
+        # Shared by the requests of every resource of the client
+        self.counters = TransferCounters()
+
+    def __call__(self, *args, **kwargs) -> PolicyHttpRequest:
+        return apply_field_mask(
+            PolicyHttpRequest(self.policy, *args, counters=self.counters, **kwargs),
+            self.policy, self.api,
+        )
@@ -0,0 +1,235 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import contextlib
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from cachetools import LRUCache
+from googleapiclient.errors import HttpError
+
+from .errors import UnsupportedPlatform
+from .utils import error_reasons, method_setting
+
+RATE_LIMIT_REASONS = frozenset(('rateLimitExceeded', 'userRateLimitExceeded'))
+# The rate is halved on every rate limited response, at most once per PENALTY_COOLDOWN
+DEFAULT_DECREASE = 0.5
+PENALTY_COOLDOWN = 1.0
+# Buckets kept by a limiter, least recently used ones are dropped
+DEFAULT_MAX_BUCKETS = 1024
+# Fraction of the configured rate recovered per second after a decrease
+DEFAULT_RECOVERY = 0.02
+
+_STATE = struct.Struct('<dddd')
+
+
+def is_rate_limited(exception) -> bool:
+    if not isinstance(exception, HttpError):
+        return False
+    return exception.resp.status == 429 or bool(error_reasons(exception) & RATE_LIMIT_REASONS)
+
+
+class _State(NamedTuple):
+    tokens: float
+    updated: float
+    rate: float
+    penalized: float
+
+
+class TokenBucket(object):
+    """Token bucket whose rate decreases on rate limited responses and recovers gradually.
+
+    Callers reserve their tokens right away and sleep for the debt, so they are served in order.
+    """
+
+    def __init__(self,
+                 rate: float,
+                 burst: Optional[float] = None,
+                 min_rate: Optional[float] = None,
+                 decrease: float = DEFAULT_DECREASE,
+                 recovery: float = DEFAULT_RECOVERY):
+        self.max_rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.min_rate = min_rate if min_rate is not None else rate / 100
+        self.decrease = decrease
+        self.recovery = recovery
+        self._lock = threading.Lock()
+        self._state: Optional[_State] = None
+
+    @property
+    def rate(self) -> float:
+        with self._locked():
+            return self._advance(self._load(), time.time()).rate
+
+    def acquire(self, cost: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Wait until cost tokens are available, False if that would take longer than timeout."""
+        with self._locked():
+            state = self._advance(self._load(), time.time())
+            wait = max(0.0, (cost - state.tokens) / state.rate)
+            if timeout is not None and wait > timeout:
+                self._store(state)
+                return False
+            self._store(state._replace(tokens=state.tokens - cost))
+
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def penalize(self):
+        now = time.time()
+        with self._locked():
+            state = self._advance(self._load(), now)
+            if now - state.penalized < PENALTY_COOLDOWN:
+                return
+            self._store(state._replace(
+                tokens=min(state.tokens, 0.0),
+                rate=max(self.min_rate, state.rate * self.decrease),
+                penalized=now,
+            ))
+
+    def _advance(self, state: Optional[_State], now: float) -> _State:
+        if state is None or state.updated == 0:
+            return _State(self.burst, now, self.max_rate, 0.0)
+
+        elapsed = max(0.0, now - state.updated)
+        rate = min(self.max_rate, state.rate + self.max_rate * self.recovery * elapsed)
+        tokens = min(self.burst, state.tokens + rate * elapsed)
+        return _State(tokens, now, rate, state.penalized)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            yield
+
+    def _load(self) -> Optional[_State]:
+        return self._state
+
+    def _store(self, state: _State):
+        self._state = state
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket kept in a small memory mapped file, shared by every process using the same path.
+
+    A closed bucket opens its file again on its next use.
+    """
+
+    def __init__(self, path: str, rate: float, **kwargs):
+        super(SharedTokenBucket, self).__init__(rate, **kwargs)
+        self.path = path
+        try:
+            import fcntl
+        except ImportError:
+            raise UnsupportedPlatform("Sharing rate limits between processes")
+        self._fcntl = fcntl
+        self._map: Optional[mmap.mmap] = None
+        with self._lock:
+            self._open()
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                os.close(self._fd)
+                self._map = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._file_lock():
+            if os.fstat(self._fd).st_size < _STATE.size:
+                os.ftruncate(self._fd, _STATE.size)
+        self._map = mmap.mmap(self._fd, _STATE.size)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # flock does not exclude threads sharing the descriptor
+        with self._lock:
+            if self._map is None:
+                self._open()
+            with self._file_lock():
+                yield
+
+    def _load(self) -> Optional[_State]:
+        return _State(*_STATE.unpack_from(self._map, 0))
+
+    def _store(self, state: _State):
+        _STATE.pack_into(self._map, 0, *state)
+
+
+class _Buckets(LRUCache):
+    # Shared buckets hold a descriptor and a mapping, released when they are dropped
+
+    def popitem(self):
+        key, bucket = super(_Buckets, self).popitem()
+        if isinstance(bucket, SharedTokenBucket):
+            bucket.close()
+        return key, bucket
+
+
+class RateLimiter(object):
+    """Token buckets per API method, and optionally per delegated subject.
+
+    rates overrides the rate of an API ("drive") or of a method ("drive.files.list").
+    With shared_dir, buckets are files in that directory shared with other processes.
+    At most max_buckets are kept, a dropped bucket starts full again unless it is shared.
+    """
+
+    def __init__(self,
+                 rate: float,
+                 burst: Optional[float] = None,
+                 per_subject: bool = False,
+                 shared_dir: Optional[str] = None,
+                 rates: Optional[Dict[str, float]] = None,
+                 max_buckets: int = DEFAULT_MAX_BUCKETS,
+                 **kwargs):
+        self.rate = rate
+        self.burst = burst
+        self.per_subject = per_subject
+        self.shared_dir = shared_dir
+        self.rates = dict(rates or {})
+        self._bucket_options = kwargs
+        self._lock = threading.Lock()
+        self._buckets = _Buckets(max_buckets)
+
+    def bucket(self, method_id: str, subject: Optional[str] = None) -> TokenBucket:
+        key = method_id
+        if self.per_subject and subject is not None:
+            key = '%s#%s' % (method_id, subject)
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = self._new_bucket(key, method_id)
+        return bucket
+
+    def _new_bucket(self, key: str, method_id: str) -> TokenBucket:
+        rate = method_setting(self.rates, method_id, self.rate)
+        if self.shared_dir is None:
+            return TokenBucket(rate, self.burst, **self._bucket_options)
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest() + '.bucket'
+        return SharedTokenBucket(os.path.join(self.shared_dir, name), rate, burst=self.burst, **self._bucket_options)
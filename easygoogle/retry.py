@@ -0,0 +1,196 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import collections
+import logging
+import random
+import socket
+import threading
+import time
+from concurrent import futures
+from typing import Callable, Deque, Dict, FrozenSet, NamedTuple, Optional
+
+from googleapiclient.errors import HttpError
+
+from .batching import RETRYABLE_REASONS, RETRYABLE_STATUS
+from .transport import is_thread_safe
+from .utils import error_reasons
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'))
+# Latencies kept per method to compute the hedging threshold
+LATENCY_SAMPLES = 256
+
+_hedge_pool = futures.ThreadPoolExecutor(max_workers=64, thread_name_prefix='easygoogle-hedge')
+
+
+class RetryBudget(object):
+    """Bounds retries to a fraction of the requests, plus a few per second.
+
+    Every request deposits ratio and every retry withdraws one, so a failing backend
+    sees at most about 1 + ratio times its normal load.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 10, max_balance: Optional[float] = None):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance if max_balance is not None else max(min_per_second * 10, 1.0)
+        self._lock = threading.Lock()
+        self._balance = self.max_balance
+        self._updated = time.monotonic()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self.max_balance, self._refilled() + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            balance = self._refilled()
+            if balance < 1:
+                self._balance = balance
+                return False
+            self._balance = balance - 1
+            return True
+
+    def _refilled(self) -> float:
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        return min(self.max_balance, self._balance + elapsed * self.min_per_second)
+
+
+class RetryStats(NamedTuple):
+    retries: int
+    hedges: int
+    budget_exhausted: int
+
+
+class RetryPolicy(object):
+    """Retries with exponential backoff and full jitter, optionally hedging slow reads.
+
+    With hedge_percentile set, a GET still running after that percentile of the latencies
+    recently seen for its method is sent a second time and the first response wins.
+    Hedging needs a thread-safe transport, see _ApiBuilder.pooled_transport.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 5,
+                 base_delay: float = 0.5,
+                 max_delay: float = 32.0,
+                 retryable_status: FrozenSet[int] = RETRYABLE_STATUS,
+                 retryable_reasons: FrozenSet[str] = RETRYABLE_REASONS,
+                 budget: Optional[RetryBudget] = None,
+                 hedge_percentile: Optional[float] = None,
+                 hedge_min_samples: int = 20):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable_status = retryable_status
+        self.retryable_reasons = retryable_reasons
+        self.budget = budget if budget is not None else RetryBudget()
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._retries = 0
+        self._hedges = 0
+        self._budget_exhausted = 0
+
+    def stats(self) -> RetryStats:
+        with self._lock:
+            return RetryStats(self._retries, self._hedges, self._budget_exhausted)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def is_retryable(self, exception, method: str) -> bool:
+        if isinstance(exception, HttpError):
+            if exception.resp.status in self.retryable_status:
+                return True
+            return bool(error_reasons(exception) & self.retryable_reasons)
+        # The request may have been processed before the connection broke
+        return isinstance(exception, (ConnectionError, socket.timeout)) and method in IDEMPOTENT_METHODS
+
+    def threshold(self, key: str) -> Optional[float]:
+        """Latency after which a read of key is hedged, None until enough samples were seen."""
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None or len(samples) < self.hedge_min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    def call(self, send: Callable, http, method: str, key: str):
+        """Run send(http) until it succeeds, a non retryable error or the budget stops it."""
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(send, http, method, key)
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts or not self.is_retryable(e, method):
+                    raise
+                if not self.budget.withdraw():
+                    with self._lock:
+                        self._budget_exhausted += 1
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning("Sleeping %.2f seconds before retry %d of %d for %s, after %s",
+                               delay, attempt, self.max_attempts - 1, key, e)
+                with self._lock:
+                    self._retries += 1
+                time.sleep(delay)
+
+    def _attempt(self, send, http, method, key):
+        threshold = None
+        if method == 'GET' and is_thread_safe(http):
+            threshold = self.threshold(key)
+
+        start = time.monotonic()
+        result = send(http) if threshold is None else self._hedged(send, http, threshold)
+        self._record(key, time.monotonic() - start)
+        return result
+
+    def _hedged(self, send, http, threshold):
+        primary = _hedge_pool.submit(send, http)
+        try:
+            return primary.result(timeout=threshold)
+        except futures.TimeoutError:
+            pass
+
+        # Hedges are extra load too
+        if not self.budget.withdraw():
+            return primary.result()
+        with self._lock:
+            self._hedges += 1
+
+        pending = {primary, _hedge_pool.submit(send, http)}
+        error = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _record(self, key, latency):
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None:
+                samples = self._latencies[key] = collections.deque(maxlen=LATENCY_SAMPLES)
+            samples.append(latency)
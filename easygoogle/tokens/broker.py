@@ -0,0 +1,340 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Local daemon holding access tokens for every process of the host.
+#
+# Clients send one JSON object per line over a Unix domain socket:
+#   {"op": "token", "key": ..., "spec": ..., "stale": ...}
+# and receive {"token": ..., "expiry": ...}, {"unknown": true} or {"error": ...}.
+# The spec describing how to mint the credentials is only sent when the broker does not know the key yet.
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from typing import Optional, Tuple
+
+import google.auth
+import google.oauth2.credentials
+from cachetools import LRUCache
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+
+from .single_flight import single_flight
+from .utils import installed_wrapper, wrap_refresh
+from ..constants import CONSTS
+from ..errors import EasygoogleError, UnsupportedPlatform
+from ..transport import default_session
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# The broker needs Unix domain sockets and file locks, the module still imports without them
+SUPPORTED = fcntl is not None and hasattr(socketserver, 'UnixStreamServer')
+_StreamServer = socketserver.UnixStreamServer if SUPPORTED else socketserver.TCPServer
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Bounds waiting for a token, a stalled broker then falls back to refreshing in process
+DEFAULT_REFRESH_TIMEOUT = 30.0
+DEFAULT_SPAWN_TIMEOUT = 10.0
+# Least recently used credentials are dropped, clients send their spec again when asked
+DEFAULT_MAX_CREDENTIALS = 16384
+# Innermost wrapper, replaces the token request made in process
+PRIORITY = -100
+
+
+class BrokerError(EasygoogleError):
+    pass
+
+
+def _check_platform():
+    if not SUPPORTED:
+        raise UnsupportedPlatform("The token broker")
+
+
+def default_socket_path() -> str:
+    return os.path.join(CONSTS.DEFAULT_APP_DIR, 'easygoogle', 'token-broker.sock')
+
+
+def spec_key(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def credentials_from_spec(spec: dict):
+    kind = spec['type']
+    scopes = spec.get('scopes')
+    if kind == 'service_account':
+        credentials = service_account.Credentials.from_service_account_info(spec['info'], scopes=scopes)
+    elif kind == 'authorized_user':
+        credentials = google.oauth2.credentials.Credentials(
+            None,
+            refresh_token=spec['refresh_token'],
+            client_id=spec['client_id'],
+            client_secret=spec['client_secret'],
+            token_uri=spec['token_uri'],
+            scopes=scopes,
+        )
+    elif kind == 'default':
+        credentials, _ = google.auth.default(scopes=scopes)
+    else:
+        raise ValueError("Unknown credentials type %s" % kind)
+
+    if spec.get('subject'):
+        credentials = credentials.with_subject(spec['subject'])
+    return credentials
+
+
+def user_credentials_spec(credentials) -> Optional[dict]:
+    """Spec of OAuth2 user credentials, None for credentials the broker cannot mint."""
+    if not isinstance(credentials, google.oauth2.credentials.Credentials) or not credentials.refresh_token:
+        return None
+    return {
+        'type': 'authorized_user',
+        'refresh_token': credentials.refresh_token,
+        'client_id': credentials.client_id,
+        'client_secret': credentials.client_secret,
+        'token_uri': credentials.token_uri,
+        'scopes': sorted(credentials.scopes or ()),
+    }
+
+
+def _to_timestamp(expiry: Optional[datetime.datetime]) -> Optional[float]:
+    if expiry is None:
+        return None
+    # google-auth keeps expiry as a naive UTC datetime
+    return expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _from_timestamp(timestamp: Optional[float]) -> Optional[datetime.datetime]:
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).replace(tzinfo=None)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.answer(json.loads(line))
+            except Exception as e:
+                logger.warning("Token broker request failed: %s", e)
+                response = {'error': str(e)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class TokenBroker(socketserver.ThreadingMixIn, _StreamServer):
+    """Mints and holds tokens, refreshing each credentials once for every connected process."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Optional[str] = None, max_credentials: int = DEFAULT_MAX_CREDENTIALS):
+        _check_platform()
+        path = path or default_socket_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Held for the broker lifetime, a socket left without it is stale
+        self._lock_file = open(path + '.lock', 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise BrokerError("A token broker already listens on %s" % path)
+        if os.path.exists(path):
+            os.unlink(path)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._credentials = LRUCache(max_credentials)
+        self._request = Request(session=default_session())
+
+        # Only the owner of the socket may ask for tokens
+        umask = os.umask(0o177)
+        try:
+            super(TokenBroker, self).__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def answer(self, message: dict) -> dict:
+        op = message.get('op')
+        if op == 'ping':
+            return {'pid': os.getpid()}
+        if op != 'token':
+            raise ValueError("Unknown operation %s" % op)
+
+        credentials = self._get_credentials(message['key'], message.get('spec'))
+        if credentials is None:
+            return {'unknown': True}
+
+        stale = message.get('stale')
+        if not credentials.valid or (stale is not None and credentials.token == stale):
+            credentials.refresh(self._request)
+        return {'token': credentials.token, 'expiry': _to_timestamp(credentials.expiry)}
+
+    def _get_credentials(self, key, spec):
+        with self._lock:
+            credentials = self._credentials.get(key)
+            if credentials is None and spec is not None:
+                if spec_key(spec) != key:
+                    raise ValueError("The spec does not match its key")
+                credentials = self._credentials[key] = credentials_from_spec(spec)
+                # Concurrent clients asking for the same expired token share one refresh,
+                # stale tokens are recognized by value instead of by refresh time
+                single_flight(credentials, reuse_window=0)
+        return credentials
+
+    def server_close(self):
+        super(TokenBroker, self).server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._lock_file.close()
+
+
+def _alive(path: str) -> bool:
+    try:
+        BrokerClient(path).ping()
+    except (OSError, BrokerError):
+        return False
+    return True
+
+
+class BrokerClient(object):
+    """Asks a token broker for tokens, opening a connection for each request."""
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 refresh_timeout: float = DEFAULT_REFRESH_TIMEOUT):
+        _check_platform()
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+        self.refresh_timeout = refresh_timeout
+
+    def ping(self) -> int:
+        return self._call({'op': 'ping'})['pid']
+
+    def token(self, spec: dict, stale: Optional[str] = None) -> Tuple[str, Optional[datetime.datetime]]:
+        key = spec_key(spec)
+        response = self._call({'op': 'token', 'key': key, 'stale': stale})
+        if response.get('unknown'):
+            response = self._call({'op': 'token', 'key': key, 'spec': spec, 'stale': stale})
+        return response['token'], _from_timestamp(response.get('expiry'))
+
+    def _call(self, message: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            # Refreshes may take longer than connecting
+            sock.settimeout(self.refresh_timeout)
+            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+        if not line:
+            raise BrokerError("The token broker closed the connection")
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise BrokerError(response['error'])
+        return response
+
+
+def connect_broker(path: Optional[str] = None,
+                   spawn: bool = True,
+                   timeout: float = DEFAULT_SPAWN_TIMEOUT) -> BrokerClient:
+    """Client of the broker listening on path, starting one in a detached process if needed."""
+    client = BrokerClient(path)
+    if _alive(client.path) or not spawn:
+        return client
+
+    subprocess.Popen(
+        [sys.executable, '-m', 'easygoogle.tokens.broker', client.path],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    # When several processes spawn at once, all but one broker fail to bind and exit
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if _alive(client.path):
+            return client
+        time.sleep(0.05)
+    raise BrokerError("The token broker did not start listening on %s" % client.path)
+
+
+class BrokeredRefresh(object):
+    """Refresh wrapper fetching tokens from the broker, falling back to refreshing in process."""
+
+    def __init__(self, credentials, client: BrokerClient, spec: dict):
+        self._credentials = weakref.ref(credentials)
+        self.client = client
+        self.spec = spec
+
+    def __call__(self, refresh, request):
+        credentials = self._credentials()
+        if credentials is None:
+            return refresh(request)
+        try:
+            credentials.token, credentials.expiry = self.client.token(self.spec, stale=credentials.token)
+        except (OSError, ValueError, KeyError, BrokerError) as e:
+            logger.warning("Token broker unavailable, refreshing in process: %s", e)
+            refresh(request)
+
+
+def use_broker(credentials, client: BrokerClient, spec: dict) -> BrokeredRefresh:
+    """Get the tokens of credentials from the broker, reusing the wrapper already installed on it."""
+    current = installed_wrapper(credentials, BrokeredRefresh)
+    if current is None:
+        current = BrokeredRefresh(credentials, client, spec)
+        wrap_refresh(credentials, current.__call__, PRIORITY)
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve access tokens to local processes.")
+    parser.add_argument('path', nargs='?', default=None, help="Unix socket to listen on")
+    parser.add_argument('--max-credentials', type=int, default=DEFAULT_MAX_CREDENTIALS,
+                        help="Credentials kept in memory, least recently used ones are dropped")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        broker = TokenBroker(args.path, args.max_credentials)
+    except (OSError, BrokerError) as e:
+        # Another process won the race to start the broker
+        logger.info("Not starting token broker: %s", e)
+        return
+
+    with broker:
+        broker.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import NamedTuple, Optional
+
+from google.auth.transport.requests import Request
+
+from .utils import seconds_to_expiry, wrap_refresh
+from ..transport import default_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MARGIN = 5 * 60
+DEFAULT_JITTER = 0.2
+# Upper bound on how long the scheduler sleeps before checking again
+MAX_SLEEP = 60
+RETRY_DELAY = 30
+# Tokens are renewed after at least this fraction of their lifetime, whatever the margin
+MAX_LEAD_FRACTION = 0.5
+
+
+class RefreshStats(NamedTuple):
+    background: int
+    request_path: int
+    failures: int
+
+
+class TokenRefresher(object):
+    """Renews tokens of attached credentials before they expire.
+
+    Each token is renewed between margin and margin * (1 + jitter) seconds before its
+    expiry, so workers sharing credentials do not refresh at the same moment. Tokens
+    living less than twice the margin are renewed halfway through their lifetime, and
+    never sooner than RETRY_DELAY after the previous renewal. Refreshes that still
+    happen while executing requests are counted as request path refreshes.
+    """
+
+    def __init__(self, margin: float = DEFAULT_MARGIN, jitter: float = DEFAULT_JITTER, request=None):
+        self.margin = margin
+        self.jitter = jitter
+        self._request = request
+        self._condition = threading.Condition()
+        # credentials -> (lead before expiry, monotonic time before which it is not renewed)
+        self._credentials = weakref.WeakKeyDictionary()
+        self._local = threading.local()
+        self._background = 0
+        self._request_path = 0
+        self._failures = 0
+        self._thread: Optional[threading.Thread] = None
+        self._task = None
+        self._stopped = False
+
+    def attach(self, credentials):
+        wrap_refresh(credentials, self._count_refresh)
+        with self._condition:
+            self._credentials[credentials] = (self._jitter(), 0.0)
+            self._condition.notify()
+        return credentials
+
+    def detach(self, credentials):
+        with self._condition:
+            self._credentials.pop(credentials, None)
+
+    def stats(self) -> RefreshStats:
+        with self._condition:
+            return RefreshStats(self._background, self._request_path, self._failures)
+
+    def start(self):
+        """Run the scheduler on a daemon thread."""
+        with self._condition:
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='easygoogle-token-refresher', daemon=True)
+                self._thread.start()
+        return self
+
+    def start_async(self):
+        """Run the scheduler as a task on the running event loop."""
+        self._stopped = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run_async())
+        return self._task
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._task is not None:
+            self._task.cancel()
+
+    def _jitter(self) -> float:
+        return self.margin * (1 + self.jitter * random.random())
+
+    def _count_refresh(self, refresh, request):
+        background = getattr(self._local, 'background', False)
+        with self._condition:
+            if background:
+                self._background += 1
+            else:
+                self._request_path += 1
+        return refresh(request)
+
+    def _due(self):
+        """Credentials due for renewal and seconds until the next one is."""
+        due = []
+        next_check = MAX_SLEEP
+        now = time.monotonic()
+        with self._condition:
+            items = list(self._credentials.items())
+        for credentials, (lead, not_before) in items:
+            remaining = seconds_to_expiry(credentials)
+            if remaining is None:
+                continue
+            wait = max(remaining - lead, not_before - now)
+            if wait <= 0:
+                due.append(credentials)
+            else:
+                next_check = min(next_check, wait)
+        return due, next_check
+
+    def _refresh(self, credentials):
+        if self._request is None:
+            self._request = Request(session=default_session())
+
+        self._local.background = True
+        try:
+            credentials.refresh(self._request)
+        except Exception as e:
+            logger.warning("Background token refresh failed: %s", e)
+            with self._condition:
+                self._failures += 1
+            return False
+        finally:
+            self._local.background = False
+
+        # Draw a new jitter for the next renewal, bounded by the lifetime of the new token
+        lifetime = seconds_to_expiry(credentials)
+        lead = self._jitter()
+        if lifetime is not None:
+            lead = min(lead, max(lifetime, 0) * MAX_LEAD_FRACTION)
+        self._schedule(credentials, lead, RETRY_DELAY)
+        return True
+
+    def _retry_later(self, credentials) -> float:
+        self._schedule(credentials, self._jitter(), RETRY_DELAY)
+        return RETRY_DELAY
+
+    def _schedule(self, credentials, lead, delay):
+        with self._condition:
+            if credentials in self._credentials:
+                self._credentials[credentials] = (lead, time.monotonic() + delay)
+
+    def _run(self):
+        while True:
+            due, next_check = self._due()
+            for credentials in due:
+                if not self._refresh(credentials):
+                    next_check = min(next_check, self._retry_later(credentials))
+            with self._condition:
+                if self._stopped:
+                    return
+                if not due:
+                    self._condition.wait(next_check)
+                if self._stopped:
+                    return
+
+    async def _run_async(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopped:
+            due, next_check = self._due()
+            for credentials in due:
+                if not await loop.run_in_executor(None, self._refresh, credentials):
+                    next_check = min(next_check, self._retry_later(credentials))
+            if not due:
+                await asyncio.sleep(next_check)
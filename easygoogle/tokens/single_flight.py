@@ -0,0 +1,100 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import time
+import weakref
+from typing import Optional
+
+from .utils import installed_wrapper, wrap_refresh
+from ..errors import RefreshTimeout
+
+DEFAULT_WAIT_TIMEOUT = 30
+# A refresh finished this recently is reused by callers that saw the previous token expire
+REUSE_WINDOW = 1.0
+# Outermost wrapper, so callers waiting on a refresh never reach the other ones
+PRIORITY = 100
+
+
+class _Flight(object):
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(object):
+    """Lets a single refresh of a credentials object be in flight at a time.
+
+    Callers arriving while a refresh runs wait up to wait_timeout seconds and share its outcome.
+    """
+
+    def __init__(self, credentials, wait_timeout: float = DEFAULT_WAIT_TIMEOUT, reuse_window: float = REUSE_WINDOW):
+        self._credentials = weakref.ref(credentials)
+        self.wait_timeout = wait_timeout
+        self.reuse_window = reuse_window
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+        self._finished_at = float('-inf')
+        self.refreshes = 0
+        self.shared = 0
+
+    def __call__(self, refresh, request):
+        credentials = self._credentials()
+        with self._lock:
+            flight = self._flight
+            if flight is None:
+                if (credentials is not None and credentials.valid
+                        and time.monotonic() - self._finished_at < self.reuse_window):
+                    self.shared += 1
+                    return
+                flight = self._flight = _Flight()
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise RefreshTimeout(self.wait_timeout)
+            if flight.error is not None:
+                raise flight.error
+            return
+
+        try:
+            refresh(request)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flight = None
+                self.refreshes += 1
+                if flight.error is None:
+                    self._finished_at = time.monotonic()
+            flight.done.set()
+
+
+def single_flight(credentials,
+                  wait_timeout: float = DEFAULT_WAIT_TIMEOUT,
+                  reuse_window: float = REUSE_WINDOW) -> SingleFlight:
+    """Coordinate the refreshes of credentials, reusing the coordinator already installed on it."""
+    current = installed_wrapper(credentials, SingleFlight)
+    if current is None:
+        current = SingleFlight(credentials, wait_timeout, reuse_window)
+        wrap_refresh(credentials, current.__call__, PRIORITY)
+    else:
+        current.wait_timeout = wait_timeout
+    return current
@@ -0,0 +1,58 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import functools
+from typing import Callable, Optional
+
+_CHAIN_ATTR = '_easygoogle_refresh_chain'
+
+
+def wrap_refresh(credentials, wrapper: Callable, priority: int = 0):
+    """Route credentials.refresh through wrapper(refresh, request).
+
+    Wrappers are installed on the instance, so google-auth internals calling self.refresh go
+    through them. Wrappers with a higher priority run first, installing the same one twice is a no-op.
+    """
+    original, wrappers = credentials.__dict__.get(_CHAIN_ATTR, (credentials.refresh, ()))
+    if any(current == wrapper for _, current in wrappers):
+        return credentials
+
+    wrappers = tuple(sorted(wrappers + ((priority, wrapper),), key=lambda item: item[0]))
+    refresh = original
+    for _, current in wrappers:
+        refresh = functools.partial(current, refresh)
+
+    credentials.refresh = refresh
+    credentials.__dict__[_CHAIN_ATTR] = (original, wrappers)
+    return credentials
+
+
+def installed_wrapper(credentials, kind: type):
+    """The installed wrapper bound to an instance of kind, if any."""
+    for _, current in credentials.__dict__.get(_CHAIN_ATTR, (None, ()))[1]:
+        if isinstance(getattr(current, '__self__', None), kind):
+            return current.__self__
+    return None
+
+
+def seconds_to_expiry(credentials) -> Optional[float]:
+    """Seconds until the current token expires, None if it never does and 0 without a token."""
+    if credentials.token is None:
+        return 0.0
+    if credentials.expiry is None:
+        return None
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return (credentials.expiry - now).total_seconds()
@@ -0,0 +1,115 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import logging
+import socket
+import threading
+from typing import Optional
+
+import httplib2
+import requests
+from google_auth_httplib2 import AuthorizedHttp
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_HOSTS = 10
+DEFAULT_POOL_SIZE = 32
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def new_session(pool_hosts: int = DEFAULT_POOL_HOSTS, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Session keeping up to pool_size alive connections for each of pool_hosts hosts.
+
+    Threads wait for a free connection instead of opening new ones, so the pool never grows past its bounds.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def default_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = new_session()
+    return _session
+
+
+def set_default_session(session: requests.Session):
+    global _session
+    with _session_lock:
+        _session = session
+
+
+class PooledHttp(object):
+    """Thread-safe replacement of httplib2.Http backed by a shared connection pool."""
+
+    follow_redirects = True
+
+    def __init__(self, session: Optional[requests.Session] = None, timeout: Optional[float] = None):
+        self.session = session if session is not None else default_session()
+        self.timeout = timeout
+        self.redirect_codes = frozenset((300, 301, 302, 303, 307))
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        try:
+            res = self.session.request(
+                method, uri,
+                data=body,
+                headers=headers,
+                timeout=self.timeout,
+                allow_redirects=self.follow_redirects and redirections > 0,
+            )
+        # Raise the same errors as httplib2, so googleapiclient retries them
+        except requests.exceptions.Timeout as e:
+            raise socket.timeout(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionError(str(e)) from e
+
+        info = {key.lower(): value for key, value in res.headers.items()}
+        # The body was already decoded by urllib3
+        if 'content-encoding' in info:
+            info['-content-encoding'] = info.pop('content-encoding')
+        info['status'] = str(res.status_code)
+        # Bytes read from the connection, before decoding
+        wire = getattr(getattr(res, 'raw', None), 'tell', None)
+        wire = wire() if callable(wire) else None
+        if isinstance(wire, int):
+            info['-wire-length'] = str(wire)
+
+        response = httplib2.Response(info)
+        response.reason = res.reason
+        return response, res.content
+
+    def close(self):
+        # The pool is shared with every other client
+        pass
+
+
+def pooled_http(credentials, session: Optional[requests.Session] = None, timeout: Optional[float] = None):
+    """Authorized transport that can be shared by many threads."""
+    http = PooledHttp(session, timeout)
+    if credentials is None:
+        return http
+    return AuthorizedHttp(credentials, http=http)
+
+
+def is_thread_safe(http) -> bool:
+    return isinstance(getattr(http, 'http', http), PooledHttp)
@@ -0,0 +1,77 @@
+#  Copyright 2017-2019 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import mmap
+import os
+import tempfile
+
+
+def atomic_write(path: str, data: bytes):
+    """Write data to path so readers either see the old content or the new one, never a partial file."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fl:
+            fl.write(data)
+            fl.flush()
+            os.fsync(fl.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def mmap_read(path: str) -> bytes:
+    """Read a whole file through a read-only memory map."""
+    with open(path, 'rb') as fl:
+        size = os.fstat(fl.fileno()).st_size
+        if size == 0:
+            return b''
+        with mmap.mmap(fl.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:]
+
+
+def error_reasons(error) -> set:
+    """Reasons listed in the body of a googleapiclient HttpError."""
+    content = getattr(error, 'content', None)
+    if not content:
+        return set()
+    try:
+        data = json.loads(content.decode('utf-8') if isinstance(content, bytes) else content)
+        details = data['error']
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+        return set()
+    if not isinstance(details, dict):
+        return set()
+    return {
+        item['reason']
+        for item in details.get('errors', ())
+        if isinstance(item, dict) and 'reason' in item
+    }
+
+
+def method_setting(settings: dict, method_id: str, default=None):
+    """Value of the most specific key of settings matching a method id, like "drive" or "drive.files.list"."""
+    parts = method_id.split('.')
+    for size in range(len(parts), 0, -1):
+        value = settings.get('.'.join(parts[:size]))
+        if value is not None:
+            return value
+    return default
@@ -62,7 +62,12 @@ setup(
         "google-api-python-client (~=1.7.11)",
         'google-auth (~=1.6.3)',
         'google-auth-oauthlib (~=0.4.0)',
+        'requests',
     ],
+    extras_require={
+        'aio': ['aiohttp'],
+        'crc32c': ['google-crc32c'],
+    },
     url="https://github.com/Fryuni/easygoogle",
     download_url=DOWNLOAD_URL,
     keywords="google apis google-apis",
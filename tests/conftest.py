@@ -0,0 +1,74 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+
+import httplib2
+import pytest
+
+from easygoogle.controllers.base import _ApiBuilder
+
+__local__ = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_DISCOVERY = os.path.join(__local__, 'data', 'sample_discovery.json')
+
+
+class RecordingHttp(object):
+    """Transport answering with canned (info, content) responses and recording what it sent."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        # (uri, method, body, headers) of every request
+        self.requests = []
+
+    @property
+    def headers(self):
+        return [headers for _, _, _, headers in self.requests]
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        self.requests.append((uri, method, body, dict(headers or {})))
+        info, content = self.responses.pop(0)
+        return httplib2.Response(info), content
+
+
+def _holding_credentials(base):
+    class Builder(base):
+        # Skips loading API information, only holds the credentials
+        def __init__(self, credentials):
+            self._credentials = credentials
+
+    return Builder
+
+
+@pytest.fixture
+def discovery_document():
+    with open(SAMPLE_DISCOVERY) as fl:
+        return json.load(fl)
+
+
+@pytest.fixture
+def recording_http():
+    return RecordingHttp
+
+
+@pytest.fixture
+def builder_class():
+    return _holding_credentials(_ApiBuilder)
+
+
+@pytest.fixture
+def async_builder_class():
+    from easygoogle.controllers.aio import _AsyncApiBuilder
+    return _holding_credentials(_AsyncApiBuilder)
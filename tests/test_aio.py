@@ -0,0 +1,117 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import concurrent.futures
+import json
+import urllib.parse
+
+import google.oauth2.credentials
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import easygoogle.controllers.aio
+import easygoogle.controllers.base
+from easygoogle.controllers.aio import AsyncHttpRequest, _AsyncApiBuilder
+
+
+def _response(status, body):
+    async def fetch(method, uri, **kwargs):
+        return httplib2.Response({'status': str(status)}), json.dumps(body).encode()
+
+    return fetch
+
+
+def test_execute_async(mocker):
+    mocker.patch('easygoogle.controllers.aio._fetch', _response(200, {'id': 'me'}))
+
+    http = mocker.Mock(spec=['credentials'])
+    request = AsyncHttpRequest(http, lambda res, content: json.loads(content), 'https://example.org/users/me')
+
+    assert asyncio.run(request.execute_async()) == {'id': 'me'}
+
+
+def test_execute_async_error(mocker):
+    mocker.patch('easygoogle.controllers.aio._fetch', _response(404, {}))
+
+    http = mocker.Mock(spec=['credentials'])
+    request = AsyncHttpRequest(http, lambda res, content: json.loads(content), 'https://example.org/users/me')
+
+    with pytest.raises(HttpError):
+        asyncio.run(request.execute_async())
+
+
+def test_get_api_async(mocker, discovery_document, async_builder_class):
+    mocker.patch('easygoogle.controllers.aio.fetch_discovery_document', return_value=json.dumps(discovery_document))
+    mocker.patch.dict(_AsyncApiBuilder._preferred_version_cache, {'sample': 'v1'})
+
+    instance = async_builder_class(None)
+
+    async def get_twice():
+        return await instance.get_api_async('sample'), await instance.get_api_async('sample')
+
+    api, again = asyncio.run(get_twice())
+    request = api.users().get(userId='me')
+
+    assert isinstance(request, AsyncHttpRequest)
+    assert again is api
+    easygoogle.controllers.aio.fetch_discovery_document.assert_awaited_once()
+
+
+def test_async_clients_per_loop(mocker, discovery_document, async_builder_class):
+    mocker.patch('easygoogle.controllers.aio.fetch_discovery_document', return_value=json.dumps(discovery_document))
+    instance = async_builder_class(None)
+
+    async def get_api():
+        return await instance.get_api_async('sample', 'v1')
+
+    first, second = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        api = first.run_until_complete(get_api())
+        # The same loop driven from another thread keeps its client
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            assert pool.submit(first.run_until_complete, get_api()).result() is api
+        assert second.run_until_complete(get_api()) is not api
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.parametrize('share_discovery_tree', [False, True])
+def test_async_clients_apply_field_masks(mocker, share_discovery_tree, discovery_document, async_builder_class):
+    mocker.patch('easygoogle.controllers.aio.fetch_discovery_document', return_value=json.dumps(discovery_document))
+    mocker.patch('easygoogle.controllers.base.SHARED_TREES', easygoogle.controllers.base._BuiltClients(4))
+
+    instance = async_builder_class(google.oauth2.credentials.Credentials('token'))
+    instance.share_discovery_tree = share_discovery_tree
+    instance.set_fields('sample', 'users.messages.list', 'messages(id)')
+
+    api = asyncio.run(instance.get_api_async('sample', 'v1'))
+    request = api.users().messages().list(userId='me')
+
+    assert isinstance(request, AsyncHttpRequest)
+    assert urllib.parse.parse_qs(urllib.parse.urlsplit(request.uri).query)['fields'] == ['messages(id)']
+
+
+def test_execute_async_resumable(mocker):
+    execute = mocker.patch.object(AsyncHttpRequest, 'execute', return_value={'id': 'uploaded'})
+
+    request = AsyncHttpRequest(
+        mocker.Mock(spec=[]), None, 'https://example.org/upload',
+        method='POST', resumable=mocker.Mock(),
+    )
+
+    assert asyncio.run(request.execute_async(num_retries=2)) == {'id': 'uploaded'}
+    assert execute.call_args[0][1] == 2
@@ -0,0 +1,86 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from easygoogle.batching import BatchEngine
+
+
+class FakeBatch(object):
+    def __init__(self, outcomes, sizes):
+        self.outcomes = outcomes
+        self.sizes = sizes
+        self.requests = []
+
+    def add(self, request, callback, request_id):
+        self.requests.append((request, callback, request_id))
+
+    def execute(self):
+        self.sizes.append(len(self.requests))
+        for request, callback, request_id in self.requests:
+            outcome = self.outcomes.get(request.name, request.name)
+            if isinstance(outcome, Exception):
+                callback(request_id, None, outcome)
+            else:
+                callback(request_id, outcome, None)
+
+
+class FakeRequest(object):
+    def __init__(self, name):
+        self.name = name
+
+    def execute(self, num_retries=0):
+        return 'retried-' + self.name
+
+
+def _error(status):
+    return HttpError(httplib2.Response({'status': str(status)}), b'{}')
+
+
+def test_requests_are_chunked():
+    sizes = []
+    with BatchEngine(lambda: FakeBatch({}, sizes), max_batch_size=3, flush_interval=10) as engine:
+        futures = [engine.submit(FakeRequest(str(idx))) for idx in range(7)]
+        engine.flush()
+
+    assert [future.result() for future in futures] == [str(idx) for idx in range(7)]
+    assert sorted(sizes) == [1, 3, 3]
+
+
+def test_failed_requests():
+    outcomes = {'throttled': _error(429), 'missing': _error(404)}
+    with BatchEngine(lambda: FakeBatch(outcomes, []), flush_interval=0) as engine:
+        ok = engine.submit(FakeRequest('ok'))
+        throttled = engine.submit(FakeRequest('throttled'))
+        missing = engine.submit(FakeRequest('missing'))
+
+    assert ok.result() == 'ok'
+    assert throttled.result() == 'retried-throttled'
+    assert isinstance(missing.exception(), HttpError)
+
+
+def test_batch_creation_failure():
+    def broken_factory():
+        raise ValueError("no batch for you")
+
+    with BatchEngine(broken_factory, flush_interval=10) as engine:
+        futures = [engine.submit(FakeRequest(str(idx))) for idx in range(3)]
+        engine.flush()
+
+        assert all(isinstance(future.exception(timeout=1), ValueError) for future in futures)
+        # The worker keeps serving later requests
+        later = engine.submit(FakeRequest('later'))
+        engine.flush()
+        assert isinstance(later.exception(timeout=1), ValueError)
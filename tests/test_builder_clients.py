@@ -0,0 +1,124 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+
+import google.oauth2.credentials
+from googleapiclient.discovery import build_from_document
+
+import easygoogle.controllers.base
+
+
+def test_clients_are_memoized(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+    build.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+
+    instance = builder_class(mocker.sentinel.credentials)
+
+    first = instance.get_api('drive', 'v3')
+    assert instance.get_api('drive', 'v3') is first
+    assert instance.get_api('drive', 'v2') is not first
+
+    assert build.call_count == 2
+    info = instance.api_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+
+def _get_api_in_thread(instance, *args, **kwargs):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(instance.get_api(*args, **kwargs)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_httplib2_clients_not_shared_between_threads(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+    build.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+
+    instance = builder_class(mocker.sentinel.credentials)
+    first = instance.get_api('drive', 'v3')
+
+    assert instance.get_api('drive', 'v3') is first
+    assert _get_api_in_thread(instance, 'drive', 'v3') is not first
+
+
+def test_pooled_clients_shared_between_threads(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+    build.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+    mocker.patch('easygoogle.controllers.base.pooled_http')
+
+    instance = builder_class(mocker.sentinel.credentials)
+    first = instance.get_api('drive', 'v3', pooled_transport=True)
+
+    assert _get_api_in_thread(instance, 'drive', 'v3', pooled_transport=True) is first
+    assert build.call_count == 1
+
+
+def test_clients_keyed_by_credentials(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+    build.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+
+    instance = builder_class(mocker.sentinel.credentials)
+    first = instance.get_api('drive', 'v3')
+
+    instance._credentials = mocker.sentinel.other_credentials
+    assert instance.get_api('drive', 'v3') is not first
+
+
+def test_clients_invalidation(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+    build.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+
+    instance = builder_class(mocker.sentinel.credentials)
+    drive = instance.get_api('drive', 'v3')
+    gmail = instance.get_api('gmail', 'v1')
+
+    instance.invalidate_api('drive')
+
+    assert instance.get_api('drive', 'v3') is not drive
+    assert instance.get_api('gmail', 'v1') is gmail
+
+
+def test_clients_memo_disabled(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+    build.side_effect = lambda *args, **kwargs: mocker.MagicMock()
+    mocker.patch.object(builder_class, 'clients_cache_size', 0)
+
+    instance = builder_class(mocker.sentinel.credentials)
+
+    assert instance.get_api('drive', 'v3') is not instance.get_api('drive', 'v3')
+
+
+def test_clients_share_discovery_tree(mocker, discovery_document, builder_class):
+    template = build_from_document(discovery_document)
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True, return_value=template)
+    mocker.patch('easygoogle.controllers.base.SHARED_TREES', easygoogle.controllers.base._BuiltClients(4))
+
+    first = builder_class(google.oauth2.credentials.Credentials('first'))
+    first.share_discovery_tree = True
+    second = builder_class(google.oauth2.credentials.Credentials('second'))
+    second.share_discovery_tree = True
+
+    first_api = first.get_api('sample', 'v1')
+    second_api = second.get_api('sample', 'v1')
+
+    assert build.call_count == 1
+    assert first_api is not second_api
+    assert first_api._http.credentials is first._credentials
+    assert second_api.users().messages().list(userId='me').http.credentials is second._credentials
+
+    first.invalidate_api('sample')
+    first.get_api('sample', 'v1')
+    assert build.call_count == 2
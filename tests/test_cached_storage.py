@@ -0,0 +1,123 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import time
+
+from google.oauth2.credentials import Credentials
+
+from easygoogle.credentials_storage.base import BaseStorage
+from easygoogle.credentials_storage.cached import CachedStorage
+
+
+class DictStore(BaseStorage):
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def get(self, client_id, user):
+        self.calls.append(('get', user))
+        return self.data.get((client_id, user))
+
+    def save(self, client_id, user, credentials):
+        self.calls.append(('save', user))
+        self.data[(client_id, user)] = credentials
+
+    def has(self, client_id, user):
+        self.calls.append(('has', user))
+        return (client_id, user) in self.data
+
+
+class BulkDictStore(DictStore):
+    def get_many(self, client_id, users):
+        users = list(users)
+        self.calls.append(('get_many', users))
+        return {user: self.data.get((client_id, user)) for user in users}
+
+
+def test_default_bulk_methods(mocker):
+    store = DictStore()
+
+    store.save_many('client', {'a': mocker.sentinel.a, 'b': mocker.sentinel.b})
+    assert store.get_many('client', ['a', 'b', 'c']) == {'a': mocker.sentinel.a, 'b': mocker.sentinel.b, 'c': None}
+
+
+def test_repeat_lookups_stay_in_memory(mocker):
+    backend = DictStore()
+    backend.data[('client', 'a')] = mocker.sentinel.a
+    store = CachedStorage(backend)
+
+    assert store.get('client', 'a') is mocker.sentinel.a
+    assert store.get('client', 'a') is mocker.sentinel.a
+    assert store.has('client', 'a')
+    assert store.get('client', 'missing') is None
+    assert not store.has('client', 'missing')
+
+    assert backend.calls == [('get', 'a'), ('get', 'missing')]
+    assert (store.hits, store.misses) == (3, 2)
+
+
+def test_batch_is_one_backend_call(mocker):
+    backend = BulkDictStore()
+    backend.data[('client', 'a')] = mocker.sentinel.a
+    store = CachedStorage(backend)
+    store.get('client', 'a')
+
+    loaded = store.get_many('client', ['a', 'b', 'c'])
+    assert loaded == {'a': mocker.sentinel.a, 'b': None, 'c': None}
+    assert backend.calls == [('get_many', ['a']), ('get_many', ['b', 'c'])]
+
+
+def test_saves_replace_negative_entries(mocker):
+    backend = DictStore()
+    store = CachedStorage(backend)
+
+    assert store.get('client', 'a') is None
+    store.save('client', 'a', mocker.sentinel.a)
+    assert store.get('client', 'a') is mocker.sentinel.a
+    assert backend.calls == [('get', 'a'), ('save', 'a')]
+
+
+def test_entries_expire(mocker):
+    backend = DictStore()
+    store = CachedStorage(backend, ttl=0.05, negative_ttl=0.05)
+
+    store.get('client', 'a')
+    backend.data[('client', 'a')] = mocker.sentinel.a
+    assert store.get('client', 'a') is None
+
+    time.sleep(0.1)
+    assert store.get('client', 'a') is mocker.sentinel.a
+
+    store.invalidate(user='a')
+    store.get('client', 'a')
+    assert backend.calls.count(('get', 'a')) == 3
+
+
+def test_tokens_not_cached_when_backend_drops_them():
+    backend = DictStore()
+    backend.store_token = False
+    store = CachedStorage(backend)
+    credentials = Credentials(
+        token='access', refresh_token='refresh', client_id='client',
+        client_secret='secret', scopes=['scope'], token_uri='https://example.com/token',
+    )
+
+    store.save('client', 'a', credentials)
+    store.save_many('client', {'b': credentials})
+
+    for user in ('a', 'b'):
+        cached = store.get('client', user)
+        assert cached.token is None
+        assert cached.refresh_token == 'refresh'
+    assert credentials.token == 'access'
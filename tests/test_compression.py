@@ -0,0 +1,76 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import gzip
+import json
+
+from googleapiclient.discovery import build_from_document
+
+from easygoogle.controllers.base import _ApiBuilder
+from easygoogle.policy import RequestBuilder, RequestPolicy
+
+
+def _post(builder, http, body):
+    return builder(http, lambda resp, content: content, 'https://example.com/sample/v1/users',
+                   method='POST', body=body, headers={'content-type': 'application/json'},
+                   methodId='sample.users.insert')
+
+
+def test_negotiates_gzip_responses(discovery_document, recording_http):
+    http = recording_http([({'status': '200', '-wire-length': '12'}, b'{"id": "me"}' * 4)])
+    api = build_from_document(discovery_document, http=http, requestBuilder=RequestBuilder(RequestPolicy()))
+
+    api.users().get(userId='me').execute()
+    headers = http.headers[0]
+    assert 'gzip' in headers['accept-encoding']
+    assert 'gzip' in headers['user-agent']
+
+    stats = _ApiBuilder.transfer_stats(api)
+    assert stats.requests == 1
+    assert (stats.received, stats.received_wire) == (48, 12)
+
+
+def test_compresses_large_bodies(recording_http):
+    policy = RequestPolicy()
+    policy.set('compressed_methods', {'sample.users': 100})
+    builder = RequestBuilder(policy)
+    http = recording_http([({'status': '200'}, b'{}')] * 2)
+    large = json.dumps({'values': ['x'] * 200})
+
+    request = _post(builder, http, large)
+    request.execute()
+    _, _, body, headers = http.requests[0]
+    assert headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(body).decode('utf-8') == large
+    # The request itself is left untouched for retries
+    assert request.body == large
+
+    _post(builder, http, '{"values": []}').execute()
+    assert 'content-encoding' not in http.headers[1]
+
+    stats = builder.counters.stats()
+    assert stats.sent == len(large) + 14
+    assert stats.sent_wire == len(body) + 14
+    assert stats.sent_wire < stats.sent
+
+
+def test_compression_disabled_by_default(recording_http):
+    builder = RequestBuilder(RequestPolicy())
+    http = recording_http([({'status': '200'}, b'{}')])
+    large = json.dumps({'values': ['x'] * 200})
+
+    _post(builder, http, large).execute()
+    _, _, body, headers = http.requests[0]
+    assert body == large
+    assert 'content-encoding' not in headers
@@ -17,8 +17,66 @@
 import json
 import os
 
+import httplib2
+
 import easygoogle.config
 
 __local__ = os.path.dirname(os.path.abspath(__file__))
 
 CONFIG_RESULT = os.path.join(__local__, 'data', 'apis.json')
+
+
+class FakeDiscoveryHttp(object):
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+
+    def request(self, uri, method='GET', headers=None, **kwargs):
+        self.requests.append((uri, headers))
+        name = uri.split('/apis/')[1].split('/')[0]
+        document = self.documents[name]
+        if headers.get('if-none-match') == document['etag']:
+            return httplib2.Response({'status': '304'}), b''
+        return httplib2.Response({'status': '200'}), json.dumps(document).encode()
+
+
+API_LIST = [
+    {'name': 'unique_api', 'title': 'Unique', 'version': 'v1', 'preferred': True,
+     'discoveryRestUrl': 'https://www.googleapis.com/discovery/v1/apis/unique_api/v1/rest'},
+    {'name': 'shared_api_a', 'title': 'Shared', 'version': 'v1', 'preferred': True,
+     'discoveryRestUrl': 'https://www.googleapis.com/discovery/v1/apis/shared_api_a/v1/rest'},
+]
+
+DOCUMENTS = {
+    'unique_api': {'etag': '"1"', 'revision': '1', 'auth': {'oauth2': {'scopes': {
+        'https://testscopes.exemple.org/auth/scope.unique': {},
+        'https://testscopes.exemple.org/auth/scope.multiple': {},
+    }}}},
+    'shared_api_a': {'etag': '"1"', 'revision': '1', 'auth': {'oauth2': {'scopes': {
+        'https://testscopes.exemple.org/auth/scope.multiple': {},
+    }}}},
+}
+
+
+def test_incremental_api_states(mocker):
+    from easygoogle.config.full_api_dict import build_api_dict_from_states, update_api_states
+
+    http = FakeDiscoveryHttp(DOCUMENTS)
+    mocker.patch('easygoogle.config.full_api_dict.PooledHttp', return_value=http)
+
+    states, changes = update_api_states(API_LIST, {}, parallelism=2)
+    assert changes == 2
+    assert http.requests[0][0].endswith('rest?fields=auth%2Crevision%2Cetag')
+
+    apis = build_api_dict_from_states(states)
+    assert apis['scope.unique']['scope'] == 'https://testscopes.exemple.org/auth/scope.unique'
+    assert [api['name'] for api in apis['scope.multiple']['apis']] == ['shared_api_a', 'unique_api']
+    assert 'discoveryRestUrl' not in apis['scope.unique']['apis'][0]
+
+    states, changes = update_api_states(API_LIST, states, parallelism=2)
+    assert changes == 0
+    assert all(headers == {'if-none-match': '"1"'} for _, headers in http.requests[2:])
+
+    states, changes = update_api_states(API_LIST[:1], states, parallelism=2)
+    assert changes == 1
+    assert list(states) == ['unique_api:v1']
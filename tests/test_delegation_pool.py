@@ -0,0 +1,85 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+
+from easygoogle.controllers.service_account import ServiceAccount
+
+
+class FakeDelegatedCredentials(object):
+    def __init__(self, subject, fail=False):
+        self.subject = subject
+        self.fail = fail
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return self.token is not None
+
+    def refresh(self, request):
+        if self.fail:
+            raise ValueError(self.subject)
+        self.refreshes += 1
+        self.token = 'token'
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+
+def _service(mocker, pool_size=None, fail=()):
+    credentials = mocker.MagicMock()
+    credentials.with_subject.side_effect = lambda user: FakeDelegatedCredentials(user, user in fail)
+    mocker.patch('easygoogle.controllers.service_account.Credentials').from_service_account_info.return_value = \
+        credentials
+    service = ServiceAccount({}, ['drive'])
+    if pool_size is not None:
+        service.delegation_pool_size = pool_size
+    return service, credentials
+
+
+def test_delegates_are_pooled(mocker):
+    service, credentials = _service(mocker)
+
+    first = service.delegate('a@example.org')
+    assert service.delegate('a@example.org') is first
+    assert service.delegate('b@example.org') is not first
+    assert credentials.with_subject.call_count == 2
+    assert service.delegation_pool_info()[:2] == (1, 2)
+
+
+def test_pool_is_bounded(mocker):
+    service, credentials = _service(mocker, pool_size=1)
+
+    first = service.delegate('a@example.org')
+    service.delegate('b@example.org')
+    assert service.delegate('a@example.org') is not first
+    assert service.delegation_pool_info().currsize == 1
+
+
+def test_pool_disabled(mocker):
+    service, _ = _service(mocker, pool_size=0)
+    assert service.delegate('a@example.org') is not service.delegate('a@example.org')
+
+
+def test_premint(mocker):
+    service, _ = _service(mocker, fail=('broken@example.org',))
+    users = ['user%d@example.org' % idx for idx in range(20)]
+
+    errors = service.premint(users + ['broken@example.org'], max_workers=4)
+    assert list(errors) == ['broken@example.org']
+    assert all(service.delegate(user).credentials.refreshes == 1 for user in users)
+
+    # Tokens far from expiry are not minted again
+    assert service.premint(users) == {}
+    assert all(service.delegate(user).credentials.refreshes == 1 for user in users)
@@ -0,0 +1,77 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+
+from easygoogle.cache.disk import DiskCache
+
+URL = 'https://www.googleapis.com/discovery/v1/apis/drive/v3/rest'
+
+
+def test_roundtrip(tmpdir):
+    cache = DiskCache(str(tmpdir))
+
+    assert cache.get(URL) is None
+
+    cache.set(URL, '{"name": "drive"}')
+
+    assert cache.get(URL) == '{"name": "drive"}'
+    assert DiskCache(str(tmpdir)).get(URL) == '{"name": "drive"}'
+
+
+def test_shared_content_is_stored_once(tmpdir):
+    cache = DiskCache(str(tmpdir))
+
+    cache.set(URL, '{"name": "drive"}')
+    cache.set(URL + '?version=v3', '{"name": "drive"}')
+
+    assert len(os.listdir(str(tmpdir.join('blobs')))) == 1
+    assert cache.get(URL + '?version=v3') == '{"name": "drive"}'
+
+
+def test_ttl_expiration(tmpdir):
+    cache = DiskCache(str(tmpdir), ttl=60)
+    cache.set(URL, '{}')
+
+    index_path = cache._index_path(URL)
+    os.utime(index_path, (0, 0))
+
+    assert cache.get(URL) is None
+
+
+def test_size_eviction(tmpdir):
+    cache = DiskCache(str(tmpdir), max_size=15)
+
+    cache.set('first', 'a' * 10)
+    os.utime(str(tmpdir.join('blobs').listdir()[0]), (0, 0))
+    cache.set('second', 'b' * 10)
+
+    assert cache.get('first') is None
+    assert cache.get('second') == 'b' * 10
+
+
+def test_blob_evicted_while_storing(tmpdir, mocker):
+    cache = DiskCache(str(tmpdir))
+    cache.set(URL, '{"name": "drive"}')
+
+    def evicted(path, *args):
+        # Another process evicts the blob right before it is touched
+        os.unlink(path)
+        raise FileNotFoundError(path)
+
+    mocker.patch('easygoogle.cache.disk.os.utime', side_effect=evicted)
+    cache.set(URL + '?version=v3', '{"name": "drive"}')
+    mocker.stopall()
+
+    assert cache.get(URL + '?version=v3') == '{"name": "drive"}'
@@ -0,0 +1,87 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import time
+
+from googleapiclient.discovery import build_from_document
+
+from easygoogle.cache.etags import ETagStore
+from easygoogle.policy import RequestBuilder, RequestPolicy
+
+
+def _client(discovery_document, http, store):
+    policy = RequestPolicy()
+    policy.set('etag_store', store)
+    return build_from_document(discovery_document, http=http, requestBuilder=RequestBuilder(policy))
+
+
+def test_not_modified_served_from_store(discovery_document, recording_http):
+    store = ETagStore()
+    http = recording_http([
+        ({'status': '200', 'etag': '"v1"'}, b'{"id": "me"}'),
+        ({'status': '304', 'etag': '"v1"'}, b''),
+        ({'status': '200', 'etag': '"v2"'}, b'{"id": "changed"}'),
+    ])
+    api = _client(discovery_document, http, store)
+
+    assert api.users().get(userId='me').execute() == b'{"id": "me"}'
+    assert api.users().get(userId='me').execute() == b'{"id": "me"}'
+    assert api.users().get(userId='me').execute() == b'{"id": "changed"}'
+
+    assert 'if-none-match' not in http.headers[0]
+    assert http.headers[1]['if-none-match'] == '"v1"'
+    assert http.headers[2]['if-none-match'] == '"v1"'
+    assert store.stats()[:3] == (1, 1, 2)
+
+
+def test_only_reads_with_etags(discovery_document, recording_http):
+    store = ETagStore()
+    http = recording_http([
+        ({'status': '200'}, b'{"id": "me"}'),
+        ({'status': '200'}, b'{"id": "me"}'),
+    ])
+    api = _client(discovery_document, http, store)
+
+    api.users().get(userId='me').execute()
+    api.users().get(userId='me').execute()
+    assert all('if-none-match' not in headers for headers in http.headers)
+    assert store.stats().stored == 0
+
+
+def test_store_bounds():
+    store = ETagStore(max_bytes=10, ttl=0.05)
+
+    store.put('a', '"a"', {}, b'12345')
+    store.put('b', '"b"', {}, b'12345')
+    store.put('c', '"c"', {}, b'12345')
+    assert store.get('a') is None
+    assert store.get('c').etag == '"c"'
+
+    # Larger than the whole store
+    store.put('d', '"d"', {}, b'x' * 20)
+    assert store.get('d') is None
+
+    time.sleep(0.1)
+    assert store.get('c') is None
+
+
+def test_revalidation_extends_expiry():
+    store = ETagStore(ttl=0.2)
+
+    store.put('a', '"a"', {}, b'12345')
+    time.sleep(0.15)
+    store.revalidated('a')
+    time.sleep(0.1)
+    assert store.get('a').etag == '"a"'
+    assert store.stats().revalidated == 1
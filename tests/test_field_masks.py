@@ -0,0 +1,77 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import urllib.parse
+
+import google.oauth2.credentials
+from googleapiclient.discovery import build_from_document
+
+import easygoogle.controllers.base
+from easygoogle.policy import with_fields
+
+
+def _query(request):
+    return urllib.parse.parse_qs(urllib.parse.urlsplit(request.uri).query)
+
+
+def _builder(discovery_document, builder_class, mocker, share_discovery_tree=False):
+    def build(api, version, **kwargs):
+        # Shared templates are built without a request builder
+        return build_from_document(discovery_document, http=kwargs.get('http'), **{
+            key: value for key, value in kwargs.items() if key == 'requestBuilder'
+        })
+
+    mocker.patch('easygoogle.controllers.base.build', side_effect=build)
+    mocker.patch('easygoogle.controllers.base.SHARED_TREES', easygoogle.controllers.base._BuiltClients(4))
+    builder = builder_class(google.oauth2.credentials.Credentials('token'))
+    builder.share_discovery_tree = share_discovery_tree
+    return builder
+
+
+def test_masks_are_applied(discovery_document, builder_class, mocker):
+    builder = _builder(discovery_document, builder_class, mocker)
+    api = builder.get_api('sample', 'v1')
+
+    # Registered after the client was built
+    builder.set_fields('sample', 'users.messages.list', 'nextPageToken,messages(id)')
+
+    request = api.users().messages().list(userId='me')
+    assert _query(request)['fields'] == ['nextPageToken,messages(id)']
+    assert 'fields' not in _query(api.users().get(userId='me'))
+
+    # Explicit fields take precedence
+    request = api.users().messages().list(userId='me', fields='messages')
+    assert _query(request)['fields'] == ['messages']
+
+    builder.set_fields('sample', 'users.messages.list', None)
+    assert 'fields' not in _query(api.users().messages().list(userId='me'))
+
+
+def test_masks_follow_pages(discovery_document, builder_class, mocker):
+    builder = _builder(discovery_document, builder_class, mocker, share_discovery_tree=True)
+    builder.set_fields('sample', 'users.messages.list', 'nextPageToken,messages(id)')
+    messages = builder.get_api('sample', 'v1').users().messages()
+
+    request = messages.list(userId='me')
+    following = messages.list_next(request, {'nextPageToken': 'next', 'messages': []})
+
+    assert _query(following)['fields'] == ['nextPageToken,messages(id)']
+    assert _query(following)['pageToken'] == ['next']
+
+
+def test_with_fields():
+    assert with_fields('https://host/path', 'id') == 'https://host/path?fields=id'
+    assert with_fields('https://host/path?a=1', 'a,b(c)') == 'https://host/path?a=1&fields=a%2Cb%28c%29'
+    assert with_fields('https://host/path?fields=name', 'id') == 'https://host/path?fields=name'
+    assert with_fields('https://host/path?alt=media', 'id') == 'https://host/path?alt=media'
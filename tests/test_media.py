@@ -0,0 +1,159 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import base64
+import hashlib
+import io
+import re
+import threading
+
+import pytest
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from easygoogle.errors import ChecksumMismatch
+from easygoogle.media import download
+
+DATA = bytes(range(256)) * 40
+URI = 'https://storage.googleapis.com/storage/v1/b/bucket/o/object?alt=media'
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.raw = io.BytesIO(content)
+        self.content = content
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self, data, hashes=None, truncate=(), status=None):
+        self.data = data
+        self.hashes = hashes
+        self.truncate = set(truncate)
+        self.status = status
+        self.ranges = []
+
+    def get(self, uri, headers=None, stream=False, timeout=None):
+        if self.status is not None:
+            return FakeResponse(self.status, {}, b'{"error": {}}')
+
+        start, end = map(int, re.fullmatch(r'bytes=(\d+)-(\d+)', headers['range']).groups())
+        end = min(end, len(self.data) - 1)
+        self.ranges.append((start, end))
+        content = self.data[start:end + 1]
+        if start in self.truncate:
+            # Connection dropped halfway through the range
+            self.truncate.discard(start)
+            content = content[:len(content) // 2]
+
+        response_headers = {'content-range': 'bytes %d-%d/%d' % (start, end, len(self.data))}
+        if self.hashes:
+            response_headers['x-goog-hash'] = self.hashes
+        return FakeResponse(206, response_headers, content)
+
+
+def _md5(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+
+def test_download_into_buffer():
+    session = FakeSession(DATA, hashes='md5=' + _md5(DATA))
+    buffer = bytearray(len(DATA) + 10)
+
+    stats = download(HttpRequest(None, None, URI), buffer, chunk_size=1000, max_workers=4, session=session)
+    assert bytes(buffer[:len(DATA)]) == DATA
+    assert stats.size == len(DATA)
+    assert stats.ranges == 11
+    assert stats.verified == ('md5',)
+    assert sorted(session.ranges)[0] == (0, 999)
+
+
+class BlockingReader(io.BytesIO):
+    def __init__(self, content, event):
+        super(BlockingReader, self).__init__(content)
+        self.event = event
+        self.waited = None
+
+    def readinto(self, buffer):
+        if self.waited is None:
+            self.waited = self.event.wait(timeout=2)
+        return super(BlockingReader, self).readinto(buffer)
+
+
+def test_first_range_read_concurrently():
+    second_requested = threading.Event()
+    session = FakeSession(DATA)
+    get = session.get
+
+    def blocking_get(uri, headers=None, **kwargs):
+        response = get(uri, headers=headers, **kwargs)
+        if headers['range'].startswith('bytes=0-'):
+            response.raw = BlockingReader(response.raw.getvalue(), second_requested)
+            session.first = response.raw
+        else:
+            second_requested.set()
+        return response
+
+    session.get = blocking_get
+    buffer = bytearray(len(DATA))
+    download(HttpRequest(None, None, URI), buffer, chunk_size=len(DATA) // 2, session=session)
+
+    assert bytes(buffer) == DATA
+    # The first range was still being read when the second one started
+    assert session.first.waited
+
+
+def test_download_to_file_resumes(tmpdir, mocker):
+    mocker.patch('easygoogle.media.time.sleep')
+    session = FakeSession(DATA, truncate=(0, 3000))
+    path = str(tmpdir.join('object'))
+
+    stats = download(HttpRequest(None, None, URI), path, chunk_size=1000, session=session)
+    with open(path, 'rb') as fl:
+        assert fl.read() == DATA
+    assert stats.resumed == 2
+    # Only the missing halves were requested again
+    assert (500, 999) in session.ranges
+    assert (3500, 3999) in session.ranges
+
+
+def test_download_checksum_mismatch():
+    session = FakeSession(DATA, hashes='md5=' + _md5(b'other'))
+
+    with pytest.raises(ChecksumMismatch):
+        download(HttpRequest(None, None, URI), bytearray(len(DATA)), chunk_size=4096, session=session)
+
+
+def test_download_errors():
+    with pytest.raises(ValueError):
+        download(HttpRequest(None, None, URI), bytearray(10), session=FakeSession(DATA))
+
+    with pytest.raises(HttpError):
+        download(HttpRequest(None, None, URI), bytearray(10), session=FakeSession(DATA, status=404))
+
+
+def test_range_ignored_without_length(tmpdir):
+    session = FakeSession(DATA)
+    session.get = lambda uri, headers=None, **kwargs: FakeResponse(200, {}, DATA)
+    path = str(tmpdir.join('object'))
+
+    stats = download(HttpRequest(None, None, URI), path, chunk_size=1000, session=session)
+    with open(path, 'rb') as fl:
+        assert fl.read() == DATA
+    assert stats.size == len(DATA)
+    assert stats.ranges == 1
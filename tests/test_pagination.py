@@ -0,0 +1,75 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+
+import httplib2
+import pytest
+from googleapiclient.http import HttpRequest
+
+from easygoogle.pagination import iterate, next_page
+from easygoogle.transport import PooledHttp
+
+PAGES = {
+    None: {'items': [1, 2], 'nextPageToken': 'second'},
+    'second': {'items': [3], 'nextPageToken': 'third'},
+    'third': {'items': [4, 5]},
+}
+
+
+class FakeHttp(PooledHttp):
+    def __init__(self):
+        super(FakeHttp, self).__init__(session=object())
+        self.uris = []
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        self.uris.append(uri)
+        token = dict(pair.split('=') for pair in uri.split('?')[1].split('&')).get('pageToken')
+        return httplib2.Response({'status': '200'}), json.dumps(PAGES[token]).encode()
+
+
+def _request(http, uri='https://example.org/items?maxResults=2'):
+    return HttpRequest(http, lambda res, content: json.loads(content), uri)
+
+
+def test_iterate_all_pages():
+    http = FakeHttp()
+
+    assert list(iterate(_request(http))) == [1, 2, 3, 4, 5]
+    assert http.uris[1] == 'https://example.org/items?maxResults=2&pageToken=second'
+
+
+def test_iterate_stops_early():
+    items = iterate(_request(FakeHttp()), prefetch=1)
+
+    assert next(items) == 1
+    items.close()
+
+
+def test_iterate_error():
+    http = FakeHttp()
+    request = _request(http, 'https://example.org/items?pageToken=unknown')
+
+    with pytest.raises(KeyError):
+        list(iterate(request))
+
+
+def test_next_page_body():
+    request = HttpRequest(None, None, 'https://example.org/search', method='POST', body='{"query": "a"}')
+
+    following = next_page(request, {'nextPageToken': 'abc'})
+
+    assert json.loads(following.body) == {'query': 'a', 'pageToken': 'abc'}
+    assert following.headers['content-length'] == str(len(following.body))
+    assert next_page(request, {}) is None
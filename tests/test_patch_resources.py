@@ -0,0 +1,83 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pickle
+
+import pytest
+from googleapiclient.discovery import build_from_document
+
+from easygoogle._patch_resources import apply_patch_resources, lazy_resources, rebind_resource
+
+
+@pytest.fixture(params=[False, True], ids=['eager', 'lazy'])
+def patch_mode(request):
+    apply_patch_resources(lazy=request.param)
+    yield request.param
+    apply_patch_resources()
+
+
+def test_nested_resources(patch_mode, discovery_document):
+    api = build_from_document(discovery_document)
+
+    assert ('users' in api.__dict__) is not patch_mode
+
+    users = api.users
+    assert users.__is_resource__
+    assert api.users() is users
+    assert api.users is users
+
+    request = api.users().messages().list(userId='me')
+    assert request.uri.startswith('https://sample.googleapis.com/sample/v1/users/me/messages')
+
+
+def test_lazy_unknown_attribute(patch_mode, discovery_document):
+    api = build_from_document(discovery_document)
+
+    with pytest.raises(AttributeError):
+        api.groups
+
+
+def test_lazy_pickle(patch_mode, discovery_document):
+    api = build_from_document(discovery_document)
+    api.users().messages()
+
+    restored = pickle.loads(pickle.dumps(api))
+
+    assert restored.users().messages().list(userId='me').uri.startswith('https://sample.googleapis.com/sample/v1/users/me/messages')
+
+
+def test_rebind_shares_tree(patch_mode, mocker, discovery_document):
+    template = build_from_document(discovery_document, http=mocker.sentinel.template_http)
+    template.users().messages()
+
+    view = rebind_resource(template, mocker.sentinel.http)
+
+    request = view.users().messages().list(userId='me')
+    assert request.http is mocker.sentinel.http
+    assert view.users() is view.users()
+    assert view.users()._resourceDesc is template.users()._resourceDesc
+    assert view._schema is template._schema
+    assert template.users().messages().list(userId='me').http is mocker.sentinel.template_http
+
+
+def test_rebind_follows_mode(patch_mode, mocker, discovery_document):
+    assert lazy_resources() is patch_mode
+    template = build_from_document(discovery_document, http=mocker.sentinel.template_http)
+    template.users().messages()
+
+    view = rebind_resource(template, mocker.sentinel.http)
+
+    # Eager views rebind their nested resources right away
+    assert ('users' in view.__dict__) is not patch_mode
+    assert view.users().messages().list(userId='me').http is mocker.sentinel.http
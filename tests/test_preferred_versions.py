@@ -0,0 +1,108 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from easygoogle.cache.versions import PreferredVersionIndex
+from easygoogle.errors import UncertainPreferredVersion, UnknownPreferredVersion
+
+DIRECTORY = [
+    {'name': 'drive', 'version': 'v3'},
+    {'name': 'admin', 'version': 'directory_v1'},
+    {'name': 'admin', 'version': 'reports_v1'},
+]
+
+
+def test_single_fetch(mocker, tmpdir):
+    fetch = mocker.Mock(return_value=DIRECTORY)
+    index = PreferredVersionIndex(fetch, path=str(tmpdir.join('index.json')))
+
+    assert index.get('drive') == 'v3'
+    with pytest.raises(UncertainPreferredVersion):
+        index.get('admin')
+    with pytest.raises(UnknownPreferredVersion):
+        index.get('unknown')
+
+    fetch.assert_called_once_with()
+
+
+def test_persisted_index(mocker, tmpdir):
+    path = str(tmpdir.join('index.json'))
+    PreferredVersionIndex(mocker.Mock(return_value=DIRECTORY), path=path).refresh()
+
+    fetch = mocker.Mock()
+    index = PreferredVersionIndex(fetch, path=path)
+
+    assert index.get('drive') == 'v3'
+    fetch.assert_not_called()
+
+
+def test_lookup_without_index(mocker, tmpdir):
+    fetch = mocker.Mock()
+    index = PreferredVersionIndex(fetch, path=str(tmpdir.join('index.json')))
+
+    assert index.lookup('drive') is None
+    fetch.assert_not_called()
+
+
+def test_stale_index_refresh(mocker, tmpdir):
+    path = str(tmpdir.join('index.json'))
+    PreferredVersionIndex(mocker.Mock(return_value=DIRECTORY), path=path).refresh()
+
+    refreshed = mocker.patch.object(PreferredVersionIndex, '_refresh_in_background')
+    index = PreferredVersionIndex(mocker.Mock(), path=path, ttl=0)
+
+    assert index.get('drive') == 'v3'
+    refreshed.assert_called_once_with()
+    assert os.path.isfile(path)
+
+
+def test_missing_api_refreshes_index(mocker, tmpdir):
+    path = str(tmpdir.join('index.json'))
+    with open(path, 'w') as fl:
+        json.dump({'fetched': time.time() - 3600, 'versions': {'drive': 'v3'}}, fl)
+
+    fetch = mocker.Mock(return_value=DIRECTORY + [{'name': 'newapi', 'version': 'v1'}])
+    index = PreferredVersionIndex(fetch, path=path)
+
+    assert index.lookup('newapi') is None
+    fetch.assert_not_called()
+
+    assert index.get('newapi') == 'v1'
+    # Recently refreshed, other misses do not fetch again
+    with pytest.raises(UnknownPreferredVersion):
+        index.get('unknown')
+    fetch.assert_called_once_with()
+
+
+def test_concurrent_cold_lookups_fetch_once(mocker, tmpdir):
+    def slow_fetch():
+        time.sleep(0.1)
+        return DIRECTORY
+
+    fetch = mocker.Mock(side_effect=slow_fetch)
+    index = PreferredVersionIndex(fetch, path=str(tmpdir.join('index.json')))
+
+    threads = [threading.Thread(target=index.get, args=('drive',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    fetch.assert_called_once_with()
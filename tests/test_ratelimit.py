@@ -0,0 +1,170 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import sys
+
+import pytest
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+
+from easygoogle.errors import UnsupportedPlatform
+from easygoogle.policy import RequestBuilder, RequestPolicy
+from easygoogle.ratelimit import RateLimiter, SharedTokenBucket, TokenBucket
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(mocker):
+    fake = FakeClock()
+    mocker.patch('easygoogle.ratelimit.time', fake)
+    return fake
+
+
+def test_burst_then_steady_rate(clock):
+    bucket = TokenBucket(rate=10, burst=5)
+
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.slept == 0
+
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_acquire_timeout(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+
+    assert bucket.acquire()
+    assert not bucket.acquire(timeout=0.5)
+    assert bucket.acquire(timeout=1)
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_decrease_and_recovery(clock):
+    bucket = TokenBucket(rate=100, recovery=0.1)
+
+    bucket.penalize()
+    assert bucket.rate == 50
+    # Responses of the same burst only count once
+    bucket.penalize()
+    assert bucket.rate == 50
+
+    clock.now += 2
+    bucket.penalize()
+    assert bucket.rate == pytest.approx(35)
+
+    clock.now += 10
+    assert bucket.rate == 100
+
+
+def test_shared_bucket(clock, tmp_path):
+    path = str(tmp_path / 'drive.bucket')
+    first = SharedTokenBucket(path, rate=10, burst=4)
+    second = SharedTokenBucket(path, rate=10, burst=4)
+
+    first.acquire(2)
+    second.acquire(2)
+    assert clock.slept == 0
+
+    first.penalize()
+    assert second.rate == 5
+    second.acquire()
+    assert clock.slept == pytest.approx(0.2)
+
+    first.close()
+    second.close()
+
+
+def test_shared_bucket_without_file_locks(mocker, tmp_path):
+    mocker.patch.dict(sys.modules, {'fcntl': None})
+
+    # Buckets local to the process do not need file locks
+    assert RateLimiter(10).bucket('drive.files.list').rate == 10
+    with pytest.raises(UnsupportedPlatform):
+        RateLimiter(10, shared_dir=str(tmp_path)).bucket('drive.files.list')
+
+
+def test_limiter_keys(tmp_path):
+    limiter = RateLimiter(10, per_subject=True, rates={'drive': 5, 'drive.files.list': 1})
+
+    assert limiter.bucket('drive.files.list', 'a') is limiter.bucket('drive.files.list', 'a')
+    assert limiter.bucket('drive.files.list', 'a') is not limiter.bucket('drive.files.list', 'b')
+    assert limiter.bucket('drive.files.list').max_rate == 1
+    assert limiter.bucket('drive.files.get').max_rate == 5
+    assert limiter.bucket('gmail.users.get').max_rate == 10
+
+    shared = RateLimiter(10, shared_dir=str(tmp_path))
+    assert isinstance(shared.bucket('drive.files.list'), SharedTokenBucket)
+
+
+def test_limiter_buckets_bounded(clock, tmp_path):
+    limiter = RateLimiter(10, per_subject=True, shared_dir=str(tmp_path), max_buckets=2)
+    first = limiter.bucket('drive.files.list', 'a')
+    first.penalize()
+
+    limiter.bucket('drive.files.list', 'b')
+    limiter.bucket('drive.files.list', 'c')
+    # Dropped, its descriptor and mapping are released
+    assert first._map is None
+
+    # The state lives in the shared file
+    assert limiter.bucket('drive.files.list', 'a').rate == 5
+    assert first.rate == 5
+
+
+def test_requests_adapt_to_rate_limits(mocker, discovery_document):
+    policy = RequestPolicy()
+    limiter = RateLimiter(100)
+    policy.set('rate_limiter', limiter)
+    http = HttpMockSequence([
+        ({'status': '200'}, '{}'),
+        ({'status': '429'}, json.dumps({'error': {'errors': [{'reason': 'rateLimitExceeded'}]}})),
+    ])
+    api = build_from_document(discovery_document, http=http, requestBuilder=RequestBuilder(policy))
+    acquire = mocker.spy(TokenBucket, 'acquire')
+
+    api.users().get(userId='me').execute()
+    with pytest.raises(HttpError):
+        api.users().get(userId='me').execute()
+
+    assert acquire.call_count == 2
+    bucket = limiter.bucket('sample.users.get')
+    assert bucket.rate < 100
+
+
+def test_delegated_policy(mocker):
+    from easygoogle.controllers.service_account import ServiceAccount
+
+    mocker.patch('easygoogle.controllers.service_account.Credentials')
+    service = ServiceAccount({}, ['drive'])
+    delegated = service.delegate('user@example.org')
+
+    limiter = service.set_rate_limit(10, per_subject=True)
+    assert delegated._request_policy.get('rate_limiter') is limiter
+    assert delegated._request_policy.subject == 'user@example.org'
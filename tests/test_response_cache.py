@@ -0,0 +1,99 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import time
+
+import pytest
+from googleapiclient.discovery import build_from_document
+from googleapiclient.http import HttpMockSequence
+
+from easygoogle.cache.responses import ResponseCache
+from easygoogle.policy import RequestBuilder, RequestPolicy
+
+
+def test_concurrent_calls_are_coalesced():
+    cache = ResponseCache()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fetch('key', 'sample.users.get', fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats().coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['result'] * 5
+    assert cache.stats() == (0, 1, 4, 1)
+
+
+def test_per_method_lifetime():
+    cache = ResponseCache(ttl=60, ttls={'sample.users': 0.05, 'sample.users.list': 0})
+
+    assert cache.get_or_fetch('a', 'sample.users.get', lambda: 1) == 1
+    assert cache.get_or_fetch('a', 'sample.users.get', lambda: 2) == 1
+    time.sleep(0.1)
+    assert cache.get_or_fetch('a', 'sample.users.get', lambda: 3) == 3
+
+    assert cache.get_or_fetch('b', 'sample.users.list', lambda: 1) == 1
+    assert cache.get_or_fetch('b', 'sample.users.list', lambda: 2) == 2
+
+    assert cache.get_or_fetch('c', 'sample.groups.get', lambda: 1) == 1
+    time.sleep(0.1)
+    assert cache.get_or_fetch('c', 'sample.groups.get', lambda: 2) == 1
+
+
+def test_errors_are_not_cached():
+    cache = ResponseCache()
+
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        cache.get_or_fetch('a', 'sample.users.get', fail)
+    assert cache.get_or_fetch('a', 'sample.users.get', lambda: 1) == 1
+
+
+def test_built_clients_reads(discovery_document):
+    cache = ResponseCache()
+    policy = RequestPolicy()
+    policy.set('response_cache', cache)
+    http = HttpMockSequence([
+        ({'status': '200'}, '{"id": "me"}'),
+        ({'status': '200'}, '{"id": "other"}'),
+        ({'status': '200'}, '{"id": "delegated"}'),
+    ])
+    api = build_from_document(discovery_document, http=http, requestBuilder=RequestBuilder(policy))
+    delegated = build_from_document(
+        discovery_document, http=http, requestBuilder=RequestBuilder(RequestPolicy(policy, subject='user@example.org')))
+
+    assert api.users().get(userId='me').execute() == b'{"id": "me"}'
+    assert api.users().get(userId='me').execute() == b'{"id": "me"}'
+    assert api.users().get(userId='other').execute() == b'{"id": "other"}'
+    # Same request made with other credentials
+    assert delegated.users().get(userId='me').execute() == b'{"id": "delegated"}'
+    assert cache.stats()[:2] == (1, 3)
@@ -0,0 +1,132 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import threading
+import time
+
+import httplib2
+import pytest
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+
+from easygoogle.policy import RequestBuilder, RequestPolicy
+from easygoogle.retry import RetryBudget, RetryPolicy
+from easygoogle.transport import PooledHttp
+
+
+def _error(status, reason=None):
+    content = json.dumps({'error': {'errors': [{'reason': reason}] if reason else []}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+@pytest.fixture
+def sleeps(mocker):
+    return mocker.patch('easygoogle.retry.time.sleep')
+
+
+def test_full_jitter_backoff():
+    policy = RetryPolicy(base_delay=1, max_delay=4)
+    delays = [policy.backoff(attempt) for attempt in range(1, 6) for _ in range(50)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert max(delays) > 2
+
+
+def test_retries_until_success(mocker, sleeps):
+    send = mocker.Mock(side_effect=[_error(503), _error(403, 'rateLimitExceeded'), mocker.sentinel.result])
+    policy = RetryPolicy()
+
+    assert policy.call(send, None, 'GET', 'sample.users.get') is mocker.sentinel.result
+    assert send.call_count == 3
+    assert sleeps.call_count == 2
+    assert policy.stats().retries == 2
+
+
+def test_classification(mocker, sleeps):
+    policy = RetryPolicy()
+
+    send = mocker.Mock(side_effect=_error(404))
+    with pytest.raises(HttpError):
+        policy.call(send, None, 'GET', 'sample.users.get')
+    assert send.call_count == 1
+
+    # A broken connection may have been processed, only idempotent calls are sent again
+    send = mocker.Mock(side_effect=[ConnectionError(), mocker.sentinel.result])
+    assert policy.call(send, None, 'GET', 'sample.users.get') is mocker.sentinel.result
+    send = mocker.Mock(side_effect=[ConnectionError(), mocker.sentinel.result])
+    with pytest.raises(ConnectionError):
+        policy.call(send, None, 'POST', 'sample.users.insert')
+
+
+def test_max_attempts(mocker, sleeps):
+    send = mocker.Mock(side_effect=_error(500))
+    with pytest.raises(HttpError):
+        RetryPolicy(max_attempts=3).call(send, None, 'GET', 'sample.users.get')
+    assert send.call_count == 3
+
+
+def test_budget_stops_retry_storms(mocker, sleeps):
+    policy = RetryPolicy(budget=RetryBudget(ratio=0.1, min_per_second=0, max_balance=2))
+    send = mocker.Mock(side_effect=_error(503))
+
+    for _ in range(3):
+        with pytest.raises(HttpError):
+            policy.call(send, None, 'GET', 'sample.users.get')
+
+    # Two retries in the budget, then every call fails on its first attempt
+    assert send.call_count == 5
+    assert policy.stats().budget_exhausted == 3
+
+
+def test_hedged_reads():
+    policy = RetryPolicy(hedge_percentile=90, hedge_min_samples=5)
+    for _ in range(10):
+        policy._record('sample.users.get', 0.01)
+
+    calls = []
+    lock = threading.Lock()
+
+    def send(http):
+        with lock:
+            calls.append(http)
+            first = len(calls) == 1
+        if first:
+            time.sleep(1)
+            return 'slow'
+        return 'fast'
+
+    start = time.monotonic()
+    assert policy.call(send, PooledHttp(), 'GET', 'sample.users.get') == 'fast'
+    assert time.monotonic() - start < 0.5
+    assert policy.stats().hedges == 1
+
+    # Writes and thread unsafe transports are never hedged
+    calls.clear()
+    assert policy.call(send, PooledHttp(), 'POST', 'sample.users.get') == 'slow'
+    calls.clear()
+    assert policy.call(send, httplib2.Http(), 'GET', 'sample.users.get') == 'slow'
+
+
+def test_policy_applies_to_built_clients(sleeps, discovery_document):
+    policy = RequestPolicy()
+    policy.set('retry_policy', RetryPolicy())
+    http = HttpMockSequence([
+        ({'status': '503'}, '{}'),
+        ({'status': '200'}, '{"id": "me"}'),
+    ])
+    api = build_from_document(discovery_document, http=http, requestBuilder=RequestBuilder(policy))
+
+    assert api.users().get(userId='me').execute() == b'{"id": "me"}'
+    assert sleeps.call_count == 1
@@ -0,0 +1,59 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+
+import easygoogle.controllers.base
+from easygoogle.config.scope_index import ApiRecord, ScopeIndex, write_scope_index
+
+__local__ = os.path.dirname(os.path.abspath(__file__))
+
+MOCKED_APIS = json.load(open(os.path.join(__local__, 'data', 'apis.json')))
+
+
+class mock_class(easygoogle.controllers.base._ApiBuilder):
+    def __init__(self, scopes):
+        self._loadApiNames(scopes)
+        self._credentials = None
+
+
+def test_index_lookup(tmpdir):
+    path = str(tmpdir.join('apis.idx'))
+    write_scope_index(MOCKED_APIS, path)
+    index = ScopeIndex(path)
+
+    assert len(index) == 2
+    assert 'scope.multiple' in index
+    assert 'scope.invalid' not in index
+    assert index.lookup('scope.invalid') is None
+
+    entry = index.lookup('scope.multiple')
+    assert entry.scope == "https://testscopes.exemple.org/auth/scope.multiple"
+    assert entry.apis[1] == ApiRecord('shared_api_b_namedversion', 'shared_api_b', 'namedversion_v1', True)
+
+
+def test_api_loading_from_index(mocker, tmpdir):
+    path = str(tmpdir.join('apis.idx'))
+    write_scope_index(MOCKED_APIS, path)
+    mocker.patch('easygoogle.controllers.base._get_scope_index', return_value=ScopeIndex(path))
+
+    instance = mock_class(['scope.unique', 'scope.multiple', 'scope.invalid'])
+
+    assert instance.valid_apis == {
+        'unique_api': ('unique_api', ['v3', 'v1']),
+        'shared_api_a': ('shared_api_a', ['v1']),
+        'shared_api_b_namedversion': ('shared_api_b', ['namedversion_v1'])
+    }
+    assert instance.apis['scope.unique'] == MOCKED_APIS['scope.unique']
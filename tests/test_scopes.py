@@ -0,0 +1,54 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+
+from easygoogle.config.scopes import ScopesIndex
+
+__local__ = os.path.dirname(os.path.abspath(__file__))
+
+MOCKED_APIS = json.load(open(os.path.join(__local__, 'data', 'apis.json')))
+
+
+def test_resolve_from_registry(mocker, tmpdir):
+    mocker.patch('easygoogle.config.scopes.load_api_dict', return_value=MOCKED_APIS)
+    index = ScopesIndex(fetch=mocker.Mock(), path=str(tmpdir.join('scopes.json')))
+
+    assert index.resolve('scope.unique') == "https://testscopes.exemple.org/auth/scope.unique"
+    assert index.resolve('drive') == "https://www.googleapis.com/auth/drive"
+    assert index.resolve('openid') == 'openid'
+    assert index.resolve('https://mail.google.com/') == 'https://mail.google.com/'
+
+
+def test_refreshed_copy(mocker, tmpdir):
+    mocker.patch('easygoogle.config.scopes.load_api_dict', return_value={})
+    path = str(tmpdir.join('scopes.json'))
+    fetch = mocker.Mock(return_value={'feeds': 'https://www.google.com/m8/feeds'})
+
+    ScopesIndex(fetch=fetch, path=path).refresh()
+    index = ScopesIndex(fetch=mocker.Mock(), path=path)
+
+    assert index.resolve('feeds') == 'https://www.google.com/m8/feeds'
+
+
+def test_auto_refresh_when_stale(mocker, tmpdir):
+    mocker.patch('easygoogle.config.scopes.load_api_dict', return_value={})
+    refresh = mocker.patch.object(ScopesIndex, '_refresh_in_background')
+
+    ScopesIndex(path=str(tmpdir.join('scopes.json'))).resolve('drive')
+    refresh.assert_not_called()
+
+    ScopesIndex(path=str(tmpdir.join('scopes.json')), auto_refresh=True).resolve('drive')
+    refresh.assert_called_once_with()
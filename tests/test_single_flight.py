@@ -0,0 +1,149 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import threading
+import time
+
+import pytest
+
+from easygoogle.errors import RefreshTimeout
+from easygoogle.tokens.refresher import TokenRefresher
+from easygoogle.tokens.single_flight import single_flight
+
+
+class SlowCredentials(object):
+    def __init__(self, delay=0.2, error=None):
+        self.delay = delay
+        self.error = error
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return self.token is not None and self.expiry > datetime.datetime.utcnow()
+
+    def refresh(self, request):
+        self.refreshes += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.token = 'token-%d' % self.refreshes
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+
+def _refresh_concurrently(credentials, count=10):
+    errors = []
+
+    def run():
+        try:
+            credentials.refresh(None)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_refreshes_share_one_request():
+    credentials = SlowCredentials()
+    flight = single_flight(credentials)
+
+    assert _refresh_concurrently(credentials) == []
+    assert credentials.refreshes == 1
+    assert credentials.token == 'token-1'
+    assert flight.refreshes == 1
+    assert flight.shared == 9
+
+
+def test_waiters_share_the_failure():
+    credentials = SlowCredentials(error=ValueError('denied'))
+    single_flight(credentials)
+
+    errors = _refresh_concurrently(credentials, 4)
+    assert credentials.refreshes == 1
+    assert len(errors) == 4
+    assert all(isinstance(e, ValueError) for e in errors)
+
+    # A failed refresh is not reused
+    credentials.error = None
+    credentials.refresh(None)
+    assert credentials.refreshes == 2
+
+
+def test_bounded_wait():
+    credentials = SlowCredentials(delay=0.5)
+    single_flight(credentials, wait_timeout=0.05)
+
+    errors = _refresh_concurrently(credentials, 3)
+    assert credentials.refreshes == 1
+    assert len(errors) == 2
+    assert all(isinstance(e, RefreshTimeout) for e in errors)
+
+
+def test_installed_once_and_outermost():
+    credentials = SlowCredentials(delay=0.1)
+    refresher = TokenRefresher(request=object())
+    flight = single_flight(credentials)
+    refresher.attach(credentials)
+
+    assert single_flight(credentials, wait_timeout=5) is flight
+    assert flight.wait_timeout == 5
+
+    _refresh_concurrently(credentials, 5)
+    # Waiting callers never reach the refresh counters
+    assert refresher.stats().request_path == 1
+
+
+def test_delegated_builders_coordinate_refresh(mocker):
+    from easygoogle.controllers.service_account import ServiceAccount
+
+    delegated_credentials = SlowCredentials()
+    credentials = mocker.MagicMock()
+    credentials.with_subject.return_value = delegated_credentials
+    mocker.patch('easygoogle.controllers.service_account.Credentials').from_service_account_info.return_value = \
+        credentials
+    mocker.patch('easygoogle.controllers.base.build')
+
+    service = ServiceAccount({}, ['drive'])
+    service.refresh_wait_timeout = 7
+    delegated = service.delegate('user@example.org')
+    delegated.get_api('drive', 'v3')
+
+    assert _refresh_concurrently(delegated_credentials) == []
+    assert delegated_credentials.refreshes == 1
+    assert single_flight(delegated_credentials, 7).wait_timeout == 7
+
+
+def test_opt_out(mocker):
+    from easygoogle.controllers.service_account import _delegated
+
+    credentials = SlowCredentials(delay=0.05)
+    mocker.patch('easygoogle.controllers.base.build')
+    builder = _delegated(credentials, None)
+    builder.single_flight_refresh = False
+    builder.get_api('drive', 'v3')
+
+    _refresh_concurrently(credentials, 3)
+    assert credentials.refreshes == 3
+
+
+@pytest.fixture(autouse=True)
+def _no_discovery(mocker):
+    mocker.patch('easygoogle.controllers.base._ApiBuilder.get_preferred_version', return_value='v3')
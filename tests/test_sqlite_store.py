@@ -0,0 +1,99 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import multiprocessing
+import threading
+
+from google.oauth2.credentials import Credentials
+
+from easygoogle.credentials_storage.base import BaseStorage
+from easygoogle.credentials_storage.sqlite import SQLiteStore
+
+
+def _credentials(token='token'):
+    return Credentials(
+        token=token,
+        refresh_token='refresh',
+        client_id='client',
+        client_secret='secret',
+        scopes=['https://www.googleapis.com/auth/drive'],
+        token_uri='https://oauth2.googleapis.com/token',
+    )
+
+
+def _save_many(path, prefix, count):
+    store = SQLiteStore(path)
+    for idx in range(count):
+        store.save('client', '%s-%d' % (prefix, idx), _credentials('%s-%d' % (prefix, idx)))
+
+
+def test_unique_key():
+    key = BaseStorage._unique_key('client', 'user')
+    assert key == BaseStorage._unique_key('client', 'user')
+    assert key != BaseStorage._unique_key('client', 'other')
+    assert len(key) == 64
+
+
+def test_roundtrip(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'credentials.db'))
+
+    assert not store.has('client', 'user')
+    assert store.get('client', 'user') is None
+
+    store.save('client', 'user', _credentials())
+    assert store.has('client', 'user')
+    assert store.get('client', 'user').token == 'token'
+
+    # Saving again updates the same row
+    store.save('client', 'user', _credentials('renewed'))
+    assert store.get('client', 'user').token == 'renewed'
+    assert store.get('client', 'user').refresh_token == 'refresh'
+
+
+def test_without_token(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'credentials.db'), store_token=False)
+    store.save('client', 'user', _credentials())
+
+    credentials = store.get('client', 'user')
+    assert credentials.token is None
+    assert credentials.refresh_token == 'refresh'
+
+
+def test_concurrent_writers(tmp_path):
+    path = str(tmp_path / 'credentials.db')
+    context = multiprocessing.get_context('spawn')
+
+    processes = [context.Process(target=_save_many, args=(path, 'process%d' % idx, 20)) for idx in range(2)]
+    threads = [threading.Thread(target=_save_many, args=(path, 'thread%d' % idx, 20)) for idx in range(2)]
+    for worker in processes + threads:
+        worker.start()
+    for worker in processes + threads:
+        worker.join()
+
+    store = SQLiteStore(path)
+    for prefix in ('process0', 'process1', 'thread0', 'thread1'):
+        for idx in range(20):
+            assert store.get('client', '%s-%d' % (prefix, idx)).token == '%s-%d' % (prefix, idx)
+
+
+def test_bulk_operations(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'credentials.db'))
+    users = ['user%d' % idx for idx in range(1200)]
+
+    store.save_many('client', {user: _credentials(user) for user in users})
+
+    loaded = store.get_many('client', users + ['unknown'])
+    assert loaded['unknown'] is None
+    assert all(loaded[user].token == user for user in users)
+    assert store.get_many('other', users[:3]) == {user: None for user in users[:3]}
@@ -0,0 +1,178 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+
+import google.oauth2.credentials
+import pytest
+
+from easygoogle.tokens.broker import BrokerClient, TokenBroker, connect_broker, use_broker, user_credentials_spec
+
+
+def _user_credentials():
+    return google.oauth2.credentials.Credentials(
+        None,
+        refresh_token='refresh',
+        client_id='client',
+        client_secret='secret',
+        token_uri='https://oauth2.googleapis.com/token',
+        scopes=['https://www.googleapis.com/auth/drive'],
+    )
+
+
+@pytest.fixture
+def minted(mocker):
+    # Token requests made by the broker
+    calls = []
+
+    def refresh(self, request):
+        calls.append(self)
+        self.token = 'minted-%d' % len(calls)
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    mocker.patch.object(google.oauth2.credentials.Credentials, 'refresh', refresh)
+    return calls
+
+
+@pytest.fixture
+def broker(tmp_path):
+    server = TokenBroker(str(tmp_path / 'broker.sock'))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_processes_share_tokens(broker, minted):
+    client = BrokerClient(broker.path)
+    workers = [_user_credentials() for _ in range(4)]
+    for credentials in workers:
+        use_broker(credentials, client, user_credentials_spec(credentials))
+
+    for credentials in workers:
+        credentials.refresh(None)
+
+    assert len(minted) == 1
+    assert {credentials.token for credentials in workers} == {'minted-1'}
+    assert all(credentials.valid for credentials in workers)
+
+
+def test_stale_token_is_renewed_once(broker, minted):
+    client = BrokerClient(broker.path)
+    spec = user_credentials_spec(_user_credentials())
+
+    token, _ = client.token(spec)
+    assert client.token(spec, stale=token)[0] == 'minted-2'
+    # Another process rejected the same token, it was already renewed
+    assert client.token(spec, stale=token)[0] == 'minted-2'
+    assert len(minted) == 2
+
+
+def test_fallback_without_broker(tmp_path, minted):
+    credentials = _user_credentials()
+    use_broker(credentials, BrokerClient(str(tmp_path / 'missing.sock')), user_credentials_spec(credentials))
+
+    credentials.refresh(None)
+    assert credentials.token == 'minted-1'
+
+
+def test_fallback_with_stalled_broker(tmp_path, minted):
+    path = str(tmp_path / 'stalled.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        # Accepts connections but never answers
+        server.bind(path)
+        server.listen(1)
+
+        credentials = _user_credentials()
+        use_broker(credentials, BrokerClient(path, refresh_timeout=0.2), user_credentials_spec(credentials))
+        credentials.refresh(None)
+
+    assert credentials.token == 'minted-1'
+
+
+def test_broker_credentials_bounded(tmp_path, minted):
+    server = TokenBroker(str(tmp_path / 'bounded.sock'), max_credentials=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = BrokerClient(server.path)
+        specs = [dict(user_credentials_spec(_user_credentials()), refresh_token=str(idx)) for idx in range(3)]
+        for spec in specs:
+            client.token(spec)
+        assert len(server._credentials) == 2
+
+        # Dropped credentials are minted again from the spec
+        assert client.token(specs[0])[0] == 'minted-4'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_single_broker_per_socket(broker):
+    with pytest.raises(Exception):
+        TokenBroker(broker.path)
+
+
+def test_builder_uses_broker(broker, minted, mocker, builder_class):
+    mocker.patch('easygoogle.controllers.base.build')
+    first = builder_class(_user_credentials())
+    second = builder_class(_user_credentials())
+    for instance in (first, second):
+        instance.use_token_broker(broker.path)
+        instance.get_api('drive', 'v3')
+        instance._credentials.refresh(None)
+
+    assert len(minted) == 1
+    assert second._credentials.token == 'minted-1'
+
+
+def test_spawned_broker(tmp_path):
+    path = str(tmp_path / 'spawned.sock')
+    client = connect_broker(path)
+    pid = client.ping()
+    try:
+        assert pid != os.getpid()
+        assert connect_broker(path).ping() == pid
+    finally:
+        os.kill(pid, signal.SIGTERM)
+
+
+def test_import_without_unix_sockets():
+    script = textwrap.dedent("""
+        import socket, socketserver, sys
+        # What Windows lacks
+        sys.modules['fcntl'] = None
+        del socket.AF_UNIX, socketserver.UnixStreamServer
+
+        import easygoogle
+        from easygoogle.controllers.base import _ApiBuilder
+        from easygoogle.errors import UnsupportedPlatform
+        from easygoogle.tokens import connect_broker
+        try:
+            connect_broker('broker.sock')
+        except UnsupportedPlatform:
+            print('unsupported')
+    """)
+    result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stdout.strip() == b'unsupported'
@@ -0,0 +1,117 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import time
+
+import pytest
+from easygoogle.tokens.refresher import TokenRefresher
+
+
+class FakeCredentials(object):
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = 'token-%d' % self.refreshes
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.lifetime)
+
+
+def test_due_credentials(mocker):
+    refresher = TokenRefresher(margin=60, jitter=0, request=mocker.sentinel.request)
+    fresh = FakeCredentials(3600)
+    fresh.refresh(None)
+    expiring = FakeCredentials(30)
+    expiring.refresh(None)
+
+    refresher.attach(fresh)
+    refresher.attach(expiring)
+
+    due, next_check = refresher._due()
+    assert due == [expiring]
+    assert next_check <= 60
+
+
+def test_refresh_counters(mocker):
+    refresher = TokenRefresher(margin=60, jitter=0, request=mocker.sentinel.request)
+    credentials = refresher.attach(FakeCredentials(3600))
+
+    credentials.refresh(mocker.sentinel.request)
+    refresher._refresh(credentials)
+
+    assert credentials.refreshes == 2
+    assert refresher.stats() == (1, 1, 0)
+
+
+def test_background_thread(mocker):
+    refresher = TokenRefresher(margin=60, jitter=0.5, request=mocker.sentinel.request)
+    credentials = refresher.attach(FakeCredentials(3600))
+
+    refresher.start()
+    try:
+        deadline = time.time() + 5
+        while credentials.token is None and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        refresher.stop()
+
+    assert credentials.token == 'token-1'
+    assert refresher.stats().background == 1
+
+
+def test_short_lived_tokens_do_not_spin(mocker):
+    # The new token lives less than the default margin
+    refresher = TokenRefresher(request=mocker.sentinel.request)
+    credentials = refresher.attach(FakeCredentials(240))
+
+    refresher.start()
+    try:
+        time.sleep(0.5)
+    finally:
+        refresher.stop()
+
+    assert credentials.refreshes == 1
+    due, next_check = refresher._due()
+    assert due == []
+    assert next_check > 0
+
+
+def test_short_lived_tokens_renewed_halfway(mocker):
+    refresher = TokenRefresher(margin=300, jitter=0, request=mocker.sentinel.request)
+    credentials = refresher.attach(FakeCredentials(240))
+    refresher._refresh(credentials)
+
+    lead, not_before = refresher._credentials[credentials]
+    assert lead == pytest.approx(120, abs=1)
+    assert not_before > time.monotonic()
+
+
+def test_builder_delegation_keeps_refresher(mocker):
+    from easygoogle.controllers.service_account import ServiceAccount
+
+    credentials = mocker.MagicMock()
+    mocker.patch('easygoogle.controllers.service_account.Credentials').from_service_account_info.return_value = \
+        credentials
+    refresher = mocker.Mock(spec=TokenRefresher)
+
+    service = ServiceAccount({}, ['drive'])
+    service.enable_background_refresh(refresher=refresher)
+    delegated = service.delegate('user@example.org')
+
+    assert delegated._token_refresher is refresher
+    refresher.attach.assert_called_with(credentials.with_subject.return_value)
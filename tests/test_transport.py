@@ -0,0 +1,65 @@
+#  Copyright 2017-2018 Luiz Augusto Alves Ferraz
+#  .
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  .
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  .
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import socket
+
+import pytest
+import requests
+from google_auth_httplib2 import AuthorizedHttp
+
+from easygoogle.transport import PooledHttp, is_thread_safe, pooled_http
+
+
+def test_pooled_http_response(mocker):
+    session = mocker.Mock(spec=requests.Session)
+    session.request.return_value = mocker.Mock(
+        status_code=200, reason='OK', content=b'{}',
+        headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+    )
+
+    response, content = PooledHttp(session).request('https://example.org', 'GET', headers={'a': 'b'})
+
+    assert response.status == 200
+    assert response['content-type'] == 'application/json'
+    assert 'content-encoding' not in response
+    assert content == b'{}'
+    session.request.assert_called_once_with(
+        'GET', 'https://example.org', data=None, headers={'a': 'b'}, timeout=None, allow_redirects=True)
+
+
+def test_pooled_http_errors(mocker):
+    session = mocker.Mock(spec=requests.Session)
+    session.request.side_effect = requests.exceptions.ReadTimeout()
+
+    with pytest.raises(socket.timeout):
+        PooledHttp(session).request('https://example.org')
+
+
+def test_pooled_http_authorization(mocker):
+    http = pooled_http(mocker.sentinel.credentials)
+
+    assert isinstance(http, AuthorizedHttp)
+    assert http.credentials is mocker.sentinel.credentials
+    assert is_thread_safe(http)
+
+
+def test_api_generation_with_pooled_transport(mocker, builder_class):
+    build = mocker.patch('easygoogle.controllers.base.build', autospec=True)
+
+    builder_class(mocker.sentinel.credentials).get_api('drive', 'v3', pooled_transport=True)
+
+    http = build.call_args[1]['http']
+    assert 'credentials' not in build.call_args[1]
+    assert http.credentials is mocker.sentinel.credentials
+    assert is_thread_safe(http)